@@ -1,10 +1,12 @@
 import tkinter as tk
-from tkinter import messagebox, ttk
-import time
 import os
+from imageCache import imageCache
 
-POPUP_INTERVAL = 60 * 60      # 1 hour in seconds
 POPUP_DURATION = 2 * 60       # 2 minutes in seconds
+BG_FRAME_DELAY = 200
+PATH_HAMSTER = "assets/water logging hamster.png"
+BACKGROUND_SCALE = 2
+THIRSTY_SCALE = 0.2
 
 # Manages UI windows and dialogs.
 class UIManager:
@@ -12,27 +14,26 @@ class UIManager:
         self.pet = pet
         self.popUpVisible = False
         self.popup = None
+        self.logWindow = None
+        self.popupCloseTimer = None
+        self.bgTimer = None
+        self.bgFuture = None
         self.preferencesWindow = None
         self.bgFrame = []
         self.bgCurrentFrame = 0
         self.bgLabel = None
         self.bgAnimationRunning = False
         self.hamsterImg = None
+        self.goalVar = None
+        self.sipVar = None
+        self.shownValues = [None, None]   # goal and sip size as last put in the window
+        self.progress = None
+        self.logPrompt = None
+        self.progLabel = None
 
     def loadBackgroundFrames(self):
         try:
-            self.bgFrame = []
-            frameIndex = 0
-
-            while True:
-                try:
-                    frame = tk.PhotoImage(file='assets/water logger.gif', format='gif -index %i' % frameIndex)
-                    scaled_frame = frame.zoom(2, 2)
-                    self.bgFrame.append(scaled_frame)
-                    frameIndex += 1
-                except tk.TclError:
-                    break
-
+            self.bgFrame = imageCache.getSprite("background", BACKGROUND_SCALE, pin=True)
             return len(self.bgFrame) > 0
         except Exception as e:
             print(f"Error loading background frames: {e}")
@@ -48,36 +49,83 @@ class UIManager:
         self.bgCurrentFrame = (self.bgCurrentFrame + 1) % len(self.bgFrame)
 
         if self.preferencesWindow and self.preferencesWindow.winfo_exists():
-            self.preferencesWindow.after(200, self.animateBackground)
+            self.bgTimer = self.pet.scheduler.schedule(BG_FRAME_DELAY, self.animateBackground)
 
     def stopBackgroundAnimation(self):
+        self.pet.scheduler.cancel(self.bgTimer)
+        self.bgTimer = None
+        # closed before the files were read; nothing will call back
+        self.pet.io.cancel(self.bgFuture)
+        self.bgFuture = None
         self.bgAnimationRunning = False
         self.bgCurrentFrame = 0
-        self.bgLabel = None
+        if self.bgFrame:
+            # let the cache reclaim the frames while the window is hidden
+            self.bgLabel.configure(image="")
+            self.bgFrame = []
+            imageCache.releaseSprite("background", BACKGROUND_SCALE)
+
+    def hidePreferences(self):
+        self.stopBackgroundAnimation()
+        self.preferencesWindow.withdraw()
 
+    # the preferences window is built once and then only shown and hidden
     def openSetup(self):
-        if self.preferencesWindow is not None:
-            self.stopBackgroundAnimation()
-            self.preferencesWindow.destroy()
+        self.pet.pollConfig(prompt=True)
+        if self.preferencesWindow is None:
+            self.buildPreferences()
+
+        self.showPreferenceValues()
+
+        if self.bgLabel is not None and not self.bgAnimationRunning:
+            # the dialog opens straight away; the background follows once an I/O
+            # worker has read its files
+            self.bgAnimationRunning = True
+            self.bgFuture = imageCache.prefetchSprite(self.pet.io, "background", BACKGROUND_SCALE,
+                                                      self.showBackground)
+
+        self.preferencesWindow.deiconify()
+        self.preferencesWindow.lift(self.pet.window)
+
+    # keepEdits leaves a value the user has changed since it was shown, so settings
+    # saved by another instance only replace the ones still untouched
+    def showPreferenceValues(self, keepEdits=False):
+        values = (self.pet.config.dailyGoal, self.pet.config.sipAmount)
+        for i, (var, value) in enumerate(zip((self.goalVar, self.sipVar), values)):
+            if keepEdits and str(var.get()) != str(self.shownValues[i]):
+                continue
+            var.set(value)
+            self.shownValues[i] = value
+
+    def showBackground(self):
+        self.bgFuture = None
+        if not self.bgAnimationRunning:
+            return
+        # open on the first frame; the rest decode in the next idle slot
+        try:
+            self.bgLabel.configure(image=imageCache.getFrame("background", BACKGROUND_SCALE, 0))
+        except Exception as e:
+            print(f"Error loading background frames: {e}")
+        self.pet.window.after_idle(self.startBackgroundAnimation)
 
+    def startBackgroundAnimation(self):
+        # the window may have been closed before this idle slot came round
+        if self.bgAnimationRunning and self.bgTimer is None and self.loadBackgroundFrames():
+            self.animateBackground()
+
+    def buildPreferences(self):
+        # ttk and messagebox are only needed once a window is built, not at startup
+        from tkinter import messagebox, ttk
         self.preferencesWindow = tk.Toplevel(self.pet.window)
+        self.preferencesWindow.withdraw()
         self.preferencesWindow.title("Preferences")
         self.preferencesWindow.geometry("1400x1060")
         self.preferencesWindow.resizable(False, False)
         self.preferencesWindow.attributes("-topmost", True)
-        self.preferencesWindow.lift(self.pet.window)
 
-        try:
-            self.hamsterImg = tk.PhotoImage(file="assets/water logging hamster.png")
-        except Exception:
-            self.hamsterImg = None
-
-        if os.path.exists("assets/water logger.gif") and self.loadBackgroundFrames():
+        if os.path.exists(imageCache.getManifest().sourcePath("background")):
             self.bgLabel = tk.Label(self.preferencesWindow)
             self.bgLabel.place(x=0, y=0, relwidth=1, relheight=1)
-
-            self.bgAnimationRunning = True
-            self.animateBackground()
         else:
             self.preferencesWindow.configure(bg='#4A90E2')
 
@@ -98,11 +146,9 @@ class UIManager:
         content = tk.Frame(canvas, bg="#f3f3f3")
         content.place(relx=0.5, rely=0.5, anchor="center")
 
-        if self.hamsterImg:
-            hamster_x = (1400 - self.hamsterImg.width()) // 2
-            self.hamster_label = tk.Label(self.preferencesWindow, image=self.hamsterImg, bd=0, bg="#f3f3f3")
-            self.hamster_label.place(x=hamster_x, y=panelY - self.hamsterImg.height() - 10)
-            self.hamster_label.lift()
+        # placed once an I/O worker has read the file
+        imageCache.prefetchImage(self.pet.io, PATH_HAMSTER, 1,
+                                 lambda: self.placeHamster(panelY))
 
         header = tk.Label(content, text="Preferences", bg="#f3f3f3", fg="#000000")
         if pressStartFont:
@@ -111,6 +157,9 @@ class UIManager:
             header.configure(font=("Helvetica", 20, "bold"))
         header.pack(pady=(10, 30))
 
+        style = ttk.Style()
+        style.theme_use("default")
+
         def createSliderRow(parent, labelText, unitText, rangeFrom, rangeTo, step, defaultVal):
             row = tk.Frame(parent, bg="#f3f3f3")
             row.pack(fill="x", padx=40, pady=20)
@@ -124,8 +173,6 @@ class UIManager:
             right_lbl.pack(side="right")
 
             style_name = f"{labelText.replace(' ', '')}.Horizontal.TScale"
-            style = ttk.Style()
-            style.theme_use("default")
             style.configure(style_name, troughcolor="#eeeeee", background="#edb36a")
 
             var = tk.IntVar(value=defaultVal)
@@ -150,8 +197,9 @@ class UIManager:
             scale.bind("<Leave>", hide_tooltip)
             return var
 
-        goalVar = createSliderRow(content, "Daily Goal", "(mL)", 0, 4000, 500, self.pet.config.dailyGoal)
-        sipVar = createSliderRow(content, "Sip Amount", "(mL)", 0, 1000, 250, self.pet.config.sipAmount)
+        self.goalVar = createSliderRow(content, "Daily Goal", "(mL)", 0, 4000, 500, self.pet.config.dailyGoal)
+        self.sipVar = createSliderRow(content, "Sip Amount", "(mL)", 0, 1000, 250, self.pet.config.sipAmount)
+        self.shownValues = [self.pet.config.dailyGoal, self.pet.config.sipAmount]
 
         # Save button
         saveBtn = tk.Button(content, text="Save", bg="#b41c27", fg="#FFFFFF", activebackground="#992026", padx=20, pady=10, bd=0)
@@ -160,22 +208,29 @@ class UIManager:
         saveBtn.pack(pady=(40, 10))
 
         def save_preferences():
-            self.pet.config.dailyGoal = int(goalVar.get())
-            self.pet.config.sipAmount = int(sipVar.get())
+            self.pet.config.dailyGoal = int(self.goalVar.get())
+            self.pet.config.sipAmount = int(self.sipVar.get())
+            # goal and sip size move the pace rule's deadline
+            self.pet.reminders.reschedule()
             messagebox.showinfo("Saved", "Preferences updated.")
-            self.stopBackgroundAnimation()
-            self.preferencesWindow.destroy()
-            self.preferencesWindow = None
+            self.hidePreferences()
         saveBtn.configure(command=save_preferences)
 
-        def onClosing():
-            self.stopBackgroundAnimation()
-            self.preferencesWindow.destroy()
-            self.preferencesWindow = None
+        self.preferencesWindow.protocol("WM_DELETE_WINDOW", self.hidePreferences)
 
-        self.preferencesWindow.protocol("WM_DELETE_WINDOW", onClosing)
+    def placeHamster(self, panelY):
+        try:
+            self.hamsterImg = imageCache.getImage(PATH_HAMSTER, pin=True)
+        except Exception:
+            self.hamsterImg = None
+            return
+        hamster_x = (1400 - self.hamsterImg.width()) // 2
+        self.hamster_label = tk.Label(self.preferencesWindow, image=self.hamsterImg, bd=0, bg="#f3f3f3")
+        self.hamster_label.place(x=hamster_x, y=panelY - self.hamsterImg.height() - 10)
+        self.hamster_label.lift()
 
     def openSetupFallback(self):
+        from tkinter import messagebox, ttk
         self.preferencesWindow = tk.Toplevel(self.pet.window)
         self.preferencesWindow.title("Dew - Preferences")
         self.preferencesWindow.geometry("500x300")
@@ -193,6 +248,7 @@ class UIManager:
             try:
                 self.pet.config.dailyGoal = int(goalVar.get())
                 self.pet.config.sipAmount = int(sipVar.get())
+                self.pet.reminders.reschedule()
                 messagebox.showinfo("Saved", "Preferences updated.")
                 self.preferencesWindow.destroy()
                 self.preferencesWindow = None
@@ -208,67 +264,97 @@ class UIManager:
         self.preferencesWindow.protocol("WM_DELETE_WINDOW", onClosing)
 
     def openLog(self):
+        self.pet.pollConfig(prompt=True)
+        if self.logWindow is None:
+            self.buildLog()
+
+        self.refreshLog()
+        self.logWindow.geometry(f"200x120+{self.pet.x+110}+{self.pet.y}")
+        self.logWindow.deiconify()
+        self.logWindow.lift()
+
+    def buildLog(self):
+        from tkinter import messagebox, ttk
         popup = tk.Toplevel(self.pet.window)
+        popup.withdraw()
         popup.title("Log Water")
         popup.attributes("-topmost", True)
-        popup.geometry(f"200x120+{self.pet.x+110}+{self.pet.y}")
 
-        tk.Label(popup, text = f"Log {self.pet.config.sipAmount} ml water?").pack(pady = 5)
+        self.logPrompt = tk.Label(popup)
+        self.logPrompt.pack(pady = 5)
 
-        progress = ttk.Progressbar(popup, maximum = self.pet.config.dailyGoal,
-                                  value = self.pet.config.currentIntake, length = 160)
-        progress.pack(pady = 5)
+        self.progress = ttk.Progressbar(popup, length = 160)
+        self.progress.pack(pady = 5)
 
-        progLabel = tk.Label(popup, text = f"{self.pet.config.currentIntake}/{self.pet.config.dailyGoal} ml")
-        progLabel.pack()
+        self.progLabel = tk.Label(popup)
+        self.progLabel.pack()
 
         def logWater():
             self.pet.config.addIntake(self.pet.config.sipAmount)
-            self.pet.config.lastIntakeTime = time.time()
-            progress["value"] = self.pet.config.currentIntake
-            progLabel.config(text = f"{self.pet.config.currentIntake}/{self.pet.config.dailyGoal} ml")
+            self.refreshLog()
             if self.pet.config.currentIntake >= self.pet.config.dailyGoal:
                 messagebox.showinfo("Congrats!", "You've met today's hydration goal!")
-            popup.destroy()
+            popup.withdraw()
 
         ttk.Button(popup, text="Drink", command=logWater).pack(pady=5)
-
+        popup.protocol("WM_DELETE_WINDOW", popup.withdraw)
+        self.logWindow = popup
+
+    def refreshLog(self):
+        self.logPrompt.config(text = f"Log {self.pet.config.sipAmount} ml water?")
+        self.progress.configure(maximum = self.pet.config.dailyGoal, value = self.pet.config.currentIntake)
+        self.progLabel.config(text = f"{self.pet.config.currentIntake}/{self.pet.config.dailyGoal} ml")
+
+    # sips or settings another instance saved came in while a window was built
+    def onConfigChanged(self):
+        if self.logWindow is not None:
+            self.refreshLog()
+        if self.preferencesWindow is not None and self.preferencesWindow.winfo_viewable():
+            self.showPreferenceValues(keepEdits=True)
+
+    # the reminder engine owns the schedule; it calls showPopUp when one is due
     def runReminder(self):
-        self.pet.window.after(POPUP_INTERVAL * 1000, self.showPopUp)
+        self.pet.reminders.start()
 
     def showPopUp(self):
-        self.pet.behaviour.setBehaviour(2)
         if self.popUpVisible:
             return
 
-        lastTime = self.pet.config.lastIntakeTime or 0
-        timeSinceLastIntake = time.time() - lastTime
+        self.pet.behaviour.trigger("remind")
+        self.popUpVisible = True
+        if self.pet.renderer.hasOverlays:
+            # drawn in the pet's own window, so it moves with the pet for free
+            self.pet.renderer.showBubble(imageCache.getSprite("thirsty", THIRSTY_SCALE, pin=True)[0])
+        else:
+            if self.popup is None:
+                self.buildPopUp()
+            self.updatePopUpPosition()
+            self.popup.deiconify()
+            # follow the pet only when it actually moves
+            self.pet.subscribePosition(self.onPetMoved)
 
-        if timeSinceLastIntake < POPUP_INTERVAL:
-            self.pet.window.after(1000, self.runReminder)
-            return
+        self.popupCloseTimer = self.pet.scheduler.schedule(POPUP_DURATION * 1000, self.close_popup)
 
+    def buildPopUp(self):
         self.popup = tk.Toplevel(self.pet.window)
+        self.popup.withdraw()
         self.popup.title("Hourly Reminder")
         self.popup.overrideredirect(True)
         self.popup.attributes("-topmost", True)
 
         transparentColour = "magenta"
         self.popup.configure(bg=transparentColour)
-        self.popup.attributes("-transparentcolor", transparentColour)
+        try:
+            self.popup.attributes("-transparentcolor", transparentColour)
+        except tk.TclError:
+            pass # only supported on Windows
 
-        photo = tk.PhotoImage(file="assets/thirsty.gif")
-        self.photo = photo.subsample(5, 5)
+        # stays pinned for as long as the bubble exists
+        self.photo = imageCache.getSprite("thirsty", THIRSTY_SCALE, pin=True)[0]
 
         image_label = tk.Label(self.popup, image=self.photo, bg=transparentColour)
         image_label.pack()
 
-        self.popUpVisible = True
-        self.updatePopUpPosition()
-
-        self.pet.window.after(POPUP_DURATION * 1000, self.close_popup)
-        self.pet.window.after(POPUP_INTERVAL * 1000, self.showPopUp)
-
     def updatePopUpPosition(self):
         if not self.popup or not self.popUpVisible:
             return
@@ -285,11 +371,34 @@ class UIManager:
 
         self.popup.geometry(f"{popupWidth}x{popupHeight}+{popupX}+{popupY}")
 
-        self.pet.window.after(100, self.updatePopUpPosition)
+    def onPetMoved(self, x, y):
+        self.updatePopUpPosition()
 
     def close_popup(self):
-        if self.popup:
-            self.pet.behaviour.setBehaviour(0)
-            self.popup.destroy()
-            self.popup = None
+        self.pet.scheduler.cancel(self.popupCloseTimer)
+        self.popupCloseTimer = None
+        self.pet.unsubscribePosition(self.onPetMoved)
+        if self.popUpVisible:
+            self.pet.behaviour.trigger("reminderEnd")
+            if self.pet.renderer.hasOverlays:
+                self.pet.renderer.hideBubble()
+                # pinned by showPopUp for as long as the bubble is up
+                imageCache.releaseSprite("thirsty", THIRSTY_SCALE)
+            else:
+                self.popup.withdraw()
             self.popUpVisible = False
+
+    # builds the windows ahead of first use, one per idle slot, while they stay hidden
+    def prewarm(self):
+        builders = [("logWindow", self.buildLog), ("preferencesWindow", self.buildPreferences)]
+        if not self.pet.renderer.hasOverlays:
+            builders.insert(1, ("popup", self.buildPopUp))
+
+        def buildNext():
+            if builders:
+                name, build = builders.pop(0)
+                # a click handled before this idle slot may have built it already
+                if getattr(self, name) is None:
+                    build()
+                self.pet.window.after_idle(buildNext)
+        self.pet.window.after_idle(buildNext)
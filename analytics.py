@@ -0,0 +1,198 @@
+import functools
+import time
+from datetime import date
+import numpy as np
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SECONDS_PER_DAY = 86400
+SECONDS_PER_QUARTER = 900
+INITIAL_CAPACITY = 1024
+
+def toOrdinal(value) -> int:
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+# Local UTC offsets for an array of timestamps, looked up once per distinct quarter
+# hour rather than once per sip. Offsets only change on quarter hours, so this puts
+# every sip on the same local day as intakeHistory.dayKey, DST switches included.
+def localOffsets(timestamps):
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64)
+    quarters, inverse = np.unique((timestamps // SECONDS_PER_QUARTER).astype(np.int64), return_inverse=True)
+    offsets = np.array([quarterOffset(quarter) for quarter in quarters.tolist()], dtype=np.int64)
+    return offsets[inverse]
+
+@functools.lru_cache(maxsize=4096)
+def quarterOffset(quarter) -> int:
+    return time.localtime(quarter * SECONDS_PER_QUARTER).tm_gmtoff
+
+class GrowableColumn:
+    def __init__(self, dtype):
+        self.values = np.zeros(INITIAL_CAPACITY, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        needed = self.size + len(values)
+        if needed > len(self.values):
+            capacity = max(needed, 2 * len(self.values))
+            grown = np.zeros(capacity, dtype=self.values.dtype)
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+        self.values[self.size:needed] = values
+        self.size = needed
+
+    def view(self):
+        return self.values[:self.size]
+
+# Hydration statistics over the full intake history, computed with vectorized NumPy
+# operations on columnar copies of the log. Results are cached per query and only
+# the entries a newly appended sip can affect are dropped.
+class HydrationAnalytics:
+    def __init__(self, history):
+        self.history = history
+        self.cache = {}
+        self.load()
+        history.subscribe(self.onAppend)
+
+    def load(self):
+        self.timestamps = GrowableColumn(np.float64)
+        self.amounts = GrowableColumn(np.int64)
+        self.dayOrdinals = GrowableColumn(np.int64)
+        self.hours = GrowableColumn(np.int8)
+        # dense daily totals starting at firstOrdinal, taken from the history's day index
+        self.firstOrdinal = None
+        self.daily = GrowableColumn(np.int64)
+
+        records = np.array(list(self.history.iterRecords()), dtype=np.float64).reshape(-1, 2)
+        self.addSips(records[:, 0], records[:, 1].astype(np.int64))
+
+        if self.history.dayOrder:
+            ordinals = np.array([toOrdinal(day) for day in self.history.dayOrder], dtype=np.int64)
+            totals = np.array([self.history.days[day][0] for day in self.history.dayOrder], dtype=np.int64)
+            self.firstOrdinal = int(ordinals[0])
+            dense = np.zeros(int(ordinals[-1]) - self.firstOrdinal + 1, dtype=np.int64)
+            dense[ordinals - self.firstOrdinal] = totals
+            self.daily.extend(dense)
+        self.cache.clear()
+
+    def addSips(self, timestamps, amounts):
+        localSeconds = timestamps.astype(np.int64) + localOffsets(timestamps)
+        self.timestamps.extend(timestamps)
+        self.amounts.extend(amounts)
+        self.dayOrdinals.extend(localSeconds // SECONDS_PER_DAY + EPOCH_ORDINAL)
+        self.hours.extend((localSeconds % SECONDS_PER_DAY) // 3600)
+
+    def onAppend(self, records):
+        batch = np.array(records, dtype=np.float64).reshape(-1, 2)
+        self.addSips(batch[:, 0], batch[:, 1].astype(np.int64))
+
+        ordinals = self.dayOrdinals.values[self.dayOrdinals.size - len(batch):self.dayOrdinals.size]
+        first = int(ordinals.min())
+        if self.firstOrdinal is None:
+            self.firstOrdinal = first
+        if first < self.firstOrdinal:
+            # back-dated sips before the first known day; rare enough to reload
+            self.load()
+            return
+        last = int(ordinals.max())
+        if last - self.firstOrdinal >= self.daily.size:
+            self.daily.extend(np.zeros(last - self.firstOrdinal - self.daily.size + 1, dtype=np.int64))
+        np.add.at(self.daily.values, ordinals - self.firstOrdinal, batch[:, 1].astype(np.int64))
+
+        # anything whose range ends before the earliest of these days cannot have changed
+        self.cache = {key: value for key, value in self.cache.items() if key[2] < first}
+
+    def cached(self, name, start, end, extra, compute):
+        key = (name, toOrdinal(start), toOrdinal(end), extra)
+        if key not in self.cache:
+            self.cache[key] = compute(key[1], key[2])
+        return self.cache[key]
+
+    # daily totals for every day in start..end inclusive, zero for days without sips
+    def dailyTotals(self, start, end):
+        return self.cached("daily", start, end, None, self.computeDailyTotals)
+
+    def computeDailyTotals(self, startOrdinal, endOrdinal):
+        totals = np.zeros(endOrdinal - startOrdinal + 1, dtype=np.int64)
+        if self.firstOrdinal is None:
+            return totals
+        lo = max(startOrdinal, self.firstOrdinal)
+        hi = min(endOrdinal, self.firstOrdinal + self.daily.size - 1)
+        if lo <= hi:
+            totals[lo - startOrdinal:hi - startOrdinal + 1] = \
+                self.daily.view()[lo - self.firstOrdinal:hi - self.firstOrdinal + 1]
+        return totals
+
+    def dayRange(self, startOrdinal, endOrdinal):
+        first = np.datetime64(date.fromordinal(startOrdinal).isoformat(), "D")
+        return first + np.arange(endOrdinal - startOrdinal + 1)
+
+    # (week start dates, average ml per day) for the Monday-based weeks in the range
+    def weeklyAverages(self, start, end):
+        def compute(startOrdinal, endOrdinal):
+            totals = self.computeDailyTotals(startOrdinal, endOrdinal)
+            ordinals = np.arange(startOrdinal, endOrdinal + 1)
+            # date.toordinal() is 1 on a Monday
+            weeks = (ordinals - 1) // 7
+            weekIndex = weeks - weeks[0]
+            averages = np.bincount(weekIndex, weights=totals) / np.bincount(weekIndex)
+            weekStarts = np.unique(weeks) * 7 + 1
+            return [date.fromordinal(int(day)) for day in weekStarts], averages
+        return self.cached("weekly", start, end, None, compute)
+
+    # (month start dates, average ml per day) for the calendar months in the range
+    def monthlyAverages(self, start, end):
+        def compute(startOrdinal, endOrdinal):
+            totals = self.computeDailyTotals(startOrdinal, endOrdinal)
+            months = self.dayRange(startOrdinal, endOrdinal).astype("datetime64[M]")
+            monthIndex = (months - months[0]).astype(np.int64)
+            averages = np.bincount(monthIndex, weights=totals) / np.bincount(monthIndex)
+            return np.unique(months).astype("datetime64[D]").tolist(), averages
+        return self.cached("monthly", start, end, None, compute)
+
+    # share of days in the range that reached the goal
+    def hitRate(self, start, end, goal: int) -> float:
+        def compute(startOrdinal, endOrdinal):
+            return float(np.mean(self.computeDailyTotals(startOrdinal, endOrdinal) >= goal))
+        return self.cached("hitRate", start, end, goal, compute)
+
+    # ml drunk in each hour of the day over the range
+    def drinkingHours(self, start, end):
+        def compute(startOrdinal, endOrdinal):
+            ordinals = self.dayOrdinals.view()
+            mask = (ordinals >= startOrdinal) & (ordinals <= endOrdinal)
+            return np.bincount(self.hours.view()[mask], weights=self.amounts.view()[mask], minlength=24)
+        return self.cached("hours", start, end, None, compute)
+
+    def typicalHours(self, start, end, count: int = 3):
+        hours = self.drinkingHours(start, end)
+        ranked = np.argsort(hours, kind="stable")[::-1][:count]
+        return [int(hour) for hour in ranked if hours[hour] > 0]
+
+    # the streak ConfigManager.resetOnNewDay would derive on each day of the range:
+    # consecutive days before it that reached the goal
+    def streaks(self, start, end, goal: int):
+        return self.cached("streaks", start, end, goal, lambda s, e: self.computeStreaks(s, e, goal))
+
+    def computeStreaks(self, startOrdinal, endOrdinal, goal):
+        days = endOrdinal - startOrdinal + 1
+        baseStreak = self.history.baseStreak
+        if self.firstOrdinal is None:
+            return np.full(days, baseStreak, dtype=np.int64)
+
+        # run lengths over the whole history up to the day before endOrdinal
+        lastOrdinal = max(endOrdinal - 1, self.firstOrdinal)
+        met = self.computeDailyTotals(self.firstOrdinal, lastOrdinal) >= goal
+        index = np.arange(len(met))
+        lastMiss = np.maximum.accumulate(np.where(met, -1, index))
+        runs = index - lastMiss
+        # an unbroken run back to the first recorded day continues the legacy streak
+        runs[lastMiss == -1] += baseStreak
+
+        ordinals = np.arange(startOrdinal, endOrdinal + 1)
+        previous = ordinals - 1 - self.firstOrdinal
+        streaks = np.full(days, baseStreak, dtype=np.int64)
+        inHistory = previous >= 0
+        streaks[inHistory] = runs[np.minimum(previous[inHistory], len(runs) - 1)]
+        return streaks
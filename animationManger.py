@@ -1,69 +1,77 @@
-import tkinter as tk
+from imageCache import imageCache
+from stateMachine import CompiledAnimations, loadStateMachine
 
-NUM_FRAMES_IDLE = 3
-NUM_FRAMES_PANIC = 6
-NUM_FRAMES_HOVER = 3
-STATE_IDLE = 0
-STATE_PANIC = 1
-STATE_HOVER = 2
-SPEED_IDLE = 400
-SPEED_PANIC = 100
-SPEED_HOVER = 150
 SCALE_FACTOR = 2
 
 class AnimationManager:
     def __init__(self):
-        self.cycle = 0
-        self.currentState = STATE_IDLE
+        self.currentState = None
+        self.position = 0
+        self.delay = 0
+        self.animations = None
 
-        self.idleFrames = []
-        self.panicFrames = []
-        self.hoverFrames = []
-
-    def loadAnimations(self):
+    # progressive loads just the first frame now; the rest come from loadNextSprite
+    # or on first use
+    def loadAnimations(self, progressive=False):
+        spec = loadStateMachine()
         try:
-            self.idleFrames = [tk.PhotoImage(file='assets/idle.gif', format='gif -index %i' % i).zoom(SCALE_FACTOR, SCALE_FACTOR)
-                            for i in range(NUM_FRAMES_IDLE)]
-            self.panicFrames = [tk.PhotoImage(file='assets/panic.gif', format='gif -index %i' % i).zoom(SCALE_FACTOR, SCALE_FACTOR)
-                                for i in range(NUM_FRAMES_PANIC)]
-            self.hoverFrames = [tk.PhotoImage(file='assets/hover.gif', format='gif -index %i' % i).zoom(SCALE_FACTOR, SCALE_FACTOR)
-                                for i in range(NUM_FRAMES_HOVER)]
+            # one compiled set per scale, shared read-only by every pet; its frames
+            # are already counted under their sprite entries
+            self.animations = imageCache.get(("animations", SCALE_FACTOR),
+                                             lambda: self.compileAnimations(spec),
+                                             pin=True, sizeOf=lambda animations: 0)
+            animations = self.animations
+            if progressive:
+                position = animations.initial
+                animations.setFrame(position, imageCache.getFrame(animations.sprites[position], SCALE_FACTOR,
+                                                                  animations.sourceIndexes[position]))
+            else:
+                animations.loadAll()
         except Exception as e:
             raise FileNotFoundError(f"{e} not found")
+        self.currentState = spec["initial"]
+        self.position = self.animations.initial
+
+    def compileAnimations(self, spec):
+        manifest = imageCache.getManifest()
+        return CompiledAnimations(spec, manifest.resolvedFrameCount,
+                                  lambda sprite: imageCache.getSprite(sprite, SCALE_FACTOR, pin=True),
+                                  manifest.durations)
+
+    def loadNextSprite(self):
+        return self.animations.loadNext()
+
+    # reads the next sprite's files on an I/O worker and calls onReady to decode it;
+    # None, without calling back, once every sprite is loaded
+    def prefetchNextSprite(self, io, onReady):
+        sprite = self.animations.nextSprite()
+        if sprite is None:
+            return None
+        return imageCache.prefetchSprite(io, sprite, SCALE_FACTOR, onReady)
+
+    def getFirstFrame(self):
+        return self.animations.frameAt(self.animations.initial)
+
+    # every distinct frame decoded so far, e.g. for a renderer to register up front
+    def getLoadedFrames(self):
+        return list(dict.fromkeys(frame for frame in self.animations.frames if frame is not None))
 
     def getDimensions(self):
-        return self.idleFrames[0].width(), self.idleFrames[0].height()
+        frame = self.getFirstFrame()
+        return frame.width(), frame.height()
 
     def getCurrFrame(self):
-        if self.currentState == STATE_IDLE:
-            frame = self.idleFrames[self.cycle]
-            self.cycle = (self.cycle + 1) % len(self.idleFrames)
-        elif self.currentState == STATE_PANIC:
-            frame = self.panicFrames[self.cycle]
-            self.cycle = (self.cycle + 1)
-            # get to frame 4, then repeat frames 3 to 4
-            if self.cycle > 4:
-                self.cycle = 3
-        elif self.currentState == STATE_HOVER:
-            frame = self.hoverFrames[self.cycle]
-            self.cycle = (self.cycle + 1) % len(self.hoverFrames)
-        else:
-            # fallback to idle
-            frame = self.idleFrames[0]
-            self.currentState = STATE_IDLE
-            self.cycle = 0
-
-        return frame
+        position = self.position
+        self.delay = self.animations.delays[position]
+        self.position = self.animations.next[position]
+        return self.animations.frameAt(position)
 
     def setState(self, newState):
         if newState != self.currentState:
             self.currentState = newState
-            self.cycle = 0
+            # unknown states fall back to the initial one
+            self.position = self.animations.starts.get(newState, self.animations.initial)
 
+    # delay after the frame last returned by getCurrFrame
     def getAnimSpeed(self):
-        speedMap = {
-            STATE_IDLE: SPEED_IDLE,  # Idle - slower
-            STATE_PANIC: SPEED_PANIC,  # Panic - faster
-            STATE_HOVER: SPEED_HOVER   # Hover - medium
-        }
-        return speedMap.get(self.currentState, 400)
\ No newline at end of file
+        return self.delay
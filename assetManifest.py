@@ -0,0 +1,77 @@
+import json
+import os
+from gifInfo import readGifFile
+
+PATH_ASSETS = "assets"
+PATH_ASSET_SPEC = os.path.join(PATH_ASSETS, "assets.json")
+PATH_BUILD = os.path.join(PATH_ASSETS, "build")
+PATH_MANIFEST = os.path.join(PATH_BUILD, "manifest.json")
+
+def scaleName(scale) -> str:
+    return f"{scale:g}x"
+
+def loadJson(path):
+    try:
+        with open(path, "r") as fp:
+            return json.load(fp)
+    except (json.JSONDecodeError, OSError):
+        return None
+
+# What the runtime knows about each named asset: assets/assets.json says which GIF it
+# comes from and how it is used, and the manifest written by buildAssets.py lists
+# the pre-scaled sprite sheets. Manifest entries whose source GIF changed since the
+# build are ignored, so a stale build falls back to decoding the GIF.
+class AssetManifest:
+    def __init__(self, specPath=PATH_ASSET_SPEC, manifestPath=PATH_MANIFEST):
+        self.spec = loadJson(specPath) or {}
+        self.built = (loadJson(manifestPath) or {}).get("assets", {})
+        self.gifInfo = {}
+
+    def sourcePath(self, name) -> str:
+        return os.path.join(PATH_ASSETS, self.spec[name]["source"])
+
+    def builtEntry(self, name):
+        entry = self.built.get(name)
+        if entry is None:
+            return None
+        try:
+            if os.stat(self.sourcePath(name)).st_mtime_ns != entry.get("sourceMtime"):
+                return None
+        except (OSError, KeyError):
+            return None
+        return entry
+
+    def readSource(self, name):
+        if name not in self.gifInfo:
+            self.gifInfo[name] = readGifFile(self.sourcePath(name))
+        return self.gifInfo[name]
+
+    # None means every frame in the source
+    def frameCount(self, name):
+        entry = self.builtEntry(name)
+        if entry is not None:
+            return entry["frames"]
+        return self.spec[name].get("frames")
+
+    # the number of frames the runtime will actually have; may read the GIF header
+    def resolvedFrameCount(self, name):
+        entry = self.builtEntry(name)
+        if entry is not None:
+            return entry["frames"]
+        available = self.readSource(name)["frames"]
+        count = self.spec[name].get("frames")
+        return min(count, available) if count else available
+
+    def durations(self, name):
+        entry = self.builtEntry(name)
+        if entry is not None:
+            return entry["durations"]
+        durations = self.readSource(name)["durations"]
+        count = self.spec[name].get("frames")
+        return durations[:count] if count else durations
+
+    def sheet(self, name, scale):
+        entry = self.builtEntry(name)
+        if entry is None:
+            return None
+        return entry["sheets"].get(scaleName(scale))
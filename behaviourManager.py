@@ -1,10 +1,11 @@
-STATE_IDLE = 0
-STATE_PANIC = 1
-STATE_HOVER = 2
+from stateMachine import loadStateMachine
 
 class BehaviourManager:
-    def __init__(self):
-        self.state = STATE_IDLE
+    def __init__(self, spec=None):
+        spec = spec or loadStateMachine()
+        self.state = spec["initial"]
+        self.transitions = spec.get("transitions", {})
+        self.draggingStates = {name for name, state in spec["states"].items() if state.get("dragging")}
 
     def getBehaviour(self):
         return self.state
@@ -12,5 +13,13 @@ class BehaviourManager:
     def setBehaviour(self, state):
         self.state = state
 
+    # moves to the state the spec lists for this event, if any
+    def trigger(self, event):
+        table = self.transitions.get(event, {})
+        newState = table.get(self.state, table.get("*"))
+        if newState is not None:
+            self.state = newState
+        return self.state
+
     def isDragging(self):
-        return (self.state == STATE_PANIC)
\ No newline at end of file
+        return self.state in self.draggingStates
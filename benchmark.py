@@ -0,0 +1,537 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PATH_BASELINE = os.path.join(REPO_DIR, "benchmark_baseline.json")
+DEFAULT_REPEAT = 20
+REGRESSION_THRESHOLD = 0.25   # flag anything 25% slower than the baseline
+XVFB_DISPLAY = ":99"
+SETTLE_TIMEOUT = 5.0          # s to wait for disk work still out on the I/O workers
+
+# Headless benchmarks for the pet. By default tkinter is replaced with the recording
+# stand-in from fakeTk, which also reports how many Tk calls each operation makes.
+# With --xvfb the real tkinter runs against a virtual X server instead.
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "mean_us": round(sum(samples) / len(samples) * 1e6, 2),
+        "p50_us": round(percentile(samples, 0.50) * 1e6, 2),
+        "p95_us": round(percentile(samples, 0.95) * 1e6, 2),
+    }
+
+class BenchmarkRun:
+    def __init__(self, fakeTk, repeat):
+        self.fakeTk = fakeTk
+        self.repeat = repeat
+        self.results = {}
+
+    def tkCalls(self):
+        return self.fakeTk.recorder.snapshot() if self.fakeTk else None
+
+    def resetCalls(self):
+        if self.fakeTk:
+            self.fakeTk.recorder.reset()
+
+    def advance(self, ms, pet):
+        if self.fakeTk:
+            self.fakeTk.loop.advance(ms)
+        else:
+            end = time.monotonic() + ms / 1000
+            while time.monotonic() < end:
+                pet.window.update()
+
+    # reads on the I/O workers take real time, which the virtual clock skips; wait for
+    # them so a measurement does not start with decodes still arriving
+    def settle(self, pet):
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while pet.io.inFlight and time.monotonic() < deadline:
+            time.sleep(0.001)
+            self.advance(10, pet)
+
+    def record(self, name, samples, calls=None, perOperation=1, **extra):
+        result = summarize(samples)
+        if calls is not None:
+            operations = len(samples) * perOperation
+            result["tkCalls"] = {call: round(count / operations, 3) for call, count in sorted(calls.items())}
+        result.update(extra)
+        self.results[name] = result
+
+def makePet():
+    import desktopPet
+    return desktopPet.DesktopPet()
+
+def closePet(pet):
+    pet.close()
+    pet.window.destroy()
+
+# full constructor time, plus time to first frame: when the pet's window has its first
+# frame and position and would map as soon as the event loop runs
+def benchStartup(run):
+    import imageCache
+    from metrics import metrics
+
+    for name, clearDisk, progressive in [("startup.cold", True, True), ("startup.warm", False, True),
+                                         ("startup.eager", True, False)]:
+        with open("config.json", "w") as fp:
+            json.dump({"progressiveStartup": progressive}, fp)
+        samples = []
+        firstFrames = []
+        run.resetCalls()
+        for _ in range(run.repeat):
+            if clearDisk:
+                shutil.rmtree(".cache", ignore_errors=True)
+            imageCache.imageCache.clear()
+            start = time.perf_counter()
+            pet = makePet()
+            samples.append(time.perf_counter() - start)
+            firstFrames.append(metrics.sinceStart("firstFrame") / 1000)
+            closePet(pet)
+        run.record(name, samples, run.tkCalls())
+        run.record(f"{name}.firstFrame", firstFrames)
+
+def benchAnimationTick(run):
+
+    pet = makePet()
+    samples = []
+    updateAnimation = pet.updateAnimation
+
+    # the loop reschedules itself through the attribute, so this times every tick
+    def timedUpdate():
+        start = time.perf_counter()
+        updateAnimation()
+        samples.append(time.perf_counter() - start)
+    pet.updateAnimation = timedUpdate
+    pet.start()
+
+    for name, state, durationMs in [("tick.idle", "idle", 20000), ("tick.hover", "hover", 6000)]:
+        pet.behaviour.setBehaviour(state)
+        run.advance(1000, pet)
+        run.settle(pet)
+        samples.clear()
+        run.resetCalls()
+        before = pet.scheduler.getStats()
+        run.advance(durationMs, pet)
+        after = pet.scheduler.getStats()
+        wakeups = after["wakeups"] - before["wakeups"]
+        run.record(name, list(samples), run.tkCalls(),
+                   wakeupsPerSecond=round(wakeups / (durationMs / 1000), 2),
+                   renderer=pet.renderer.getStats())
+    closePet(pet)
+
+# Wakeups per minute in each pacing mode. Needs the virtual clock to skip through
+# minutes of idle time, so it only runs on the stand-in.
+def benchPacing(run):
+    if run.fakeTk is None:
+        print("pacing needs the virtual clock, skipped", file=sys.stderr)
+        return
+
+    pet = makePet()
+    samples = []
+    updateAnimation = pet.updateAnimation
+
+    def timedUpdate():
+        start = time.perf_counter()
+        updateAnimation()
+        samples.append(time.perf_counter() - start)
+    pet.updateAnimation = timedUpdate
+    pet.start()
+    run.advance(3000, pet)
+    run.settle(pet)
+    # the first-run setup window animates too; keep only the pet's own wakeups
+    pet.uiManager.hidePreferences()
+
+    def measure(name, durationMs):
+        samples.clear()
+        run.resetCalls()
+        before = pet.scheduler.getStats()["wakeups"]
+        run.advance(durationMs, pet)
+        wakeups = pet.scheduler.getStats()["wakeups"] - before
+        run.record(name, list(samples), run.tkCalls(), mode=pet.pacer.mode,
+                   wakeupsPerMinute=round(wakeups * 60000 / durationMs, 1))
+
+    policy = pet.pacer.policy
+    pet.noteInput()
+    measure("pacing.normal", policy.idleAfterMs // 2)
+    run.advance(policy.idleAfterMs, pet)
+    measure("pacing.idle", 60000)
+    run.advance(policy.sleepAfterMs, pet)
+    measure("pacing.asleep", 60000)
+
+    run.fakeTk.loop.pointer = (1, 1)
+    pet.noteInput()
+    pet.window.bindings["<Unmap>"](run.fakeTk.Event())
+    measure("pacing.hidden", 60000)
+    closePet(pet)
+
+# N pets under one PetHost: time per shared tick, wakeups and image memory should
+# stay nearly flat as N grows
+def benchPets(run):
+    import imageCache
+    from petHost import PetHost
+
+    for count in [1, 4, 16]:
+        imageCache.imageCache.clear()
+        host = PetHost()
+        for i in range(count):
+            host.addPet(f"bench{i}")
+        samples = []
+        tick = host.tick
+
+        def timedTick():
+            start = time.perf_counter()
+            tick()
+            samples.append(time.perf_counter() - start)
+        host.tick = timedTick
+        for pet in host.pets:
+            pet.config.data["lastResetDate"] = "bench"
+            pet.start()
+
+        run.advance(1000, host.pets[0])
+        run.settle(host.pets[0])
+        samples.clear()
+        run.resetCalls()
+        before = host.scheduler.getStats()["wakeups"]
+        durationMs = 20000
+        run.advance(durationMs, host.pets[0])
+        wakeups = host.scheduler.getStats()["wakeups"] - before
+        run.record(f"pets.{count}", samples, run.tkCalls(),
+                   wakeupsPerMinute=round(wakeups * 60000 / durationMs, 1),
+                   imageCacheBytes=imageCache.imageCache.usedBytes)
+        host.close()
+
+def benchDrag(run):
+    pet = makePet()
+    pet.start()
+    # let the first-run setup window open before measuring
+    run.advance(1000, pet)
+    run.settle(pet)
+    handler = pet.mouseHandler
+    eventClass = run.fakeTk.Event if run.fakeTk else None
+
+    samples = []
+    run.resetCalls()
+    for rateHz in [125, 1000]:
+        x, y = pet.x + 10, pet.y + 10
+        handler.pressLeft(makeEvent(eventClass, 10, 10, x, y))
+        for i in range(2000):
+            x += 1
+            event = makeEvent(eventClass, 10, 10, x, y + i % 3)
+            start = time.perf_counter()
+            handler.mouseMove(event)
+            samples.append(time.perf_counter() - start)
+            run.advance(1000 / rateHz, pet)
+        handler.releaseLeft(makeEvent(eventClass, 10, 10, x, y))
+    run.record("drag.motionEvent", samples, run.tkCalls(), dragStats=handler.getDragStats())
+    closePet(pet)
+
+# the same idle ticks, reminder bubble and drag on each renderer backend
+def benchRenderer(run):
+    eventClass = run.fakeTk.Event if run.fakeTk else None
+    for backend in ["label", "canvas"]:
+        with open("config.json", "w") as fp:
+            json.dump({"renderer": backend, "lastResetDate": "bench", "prewarmWindows": False}, fp)
+        pet = makePet()
+        samples = []
+        updateAnimation = pet.updateAnimation
+
+        def timedUpdate():
+            start = time.perf_counter()
+            updateAnimation()
+            samples.append(time.perf_counter() - start)
+        pet.updateAnimation = timedUpdate
+        pet.start()
+        run.advance(1000, pet)
+        run.settle(pet)
+        samples.clear()
+        run.resetCalls()
+        run.advance(20000, pet)
+        run.record(f"render.{backend}.tick", list(samples), run.tkCalls(), renderer=pet.renderer.getStats())
+
+        # the first reminder builds the label path's window; measure the ones after it
+        ui = pet.uiManager
+        ui.showPopUp()
+        ui.close_popup()
+        bubbleSamples = []
+        run.resetCalls()
+        for _ in range(run.repeat):
+            start = time.perf_counter()
+            ui.showPopUp()
+            ui.close_popup()
+            bubbleSamples.append(time.perf_counter() - start)
+        run.record(f"render.{backend}.bubble", bubbleSamples, run.tkCalls())
+
+        # dragging with the bubble up moves one window on the canvas, two on the label path
+        ui.showPopUp()
+        handler = pet.mouseHandler
+        dragSamples = []
+        x, y = pet.x + 10, pet.y + 10
+        handler.pressLeft(makeEvent(eventClass, 10, 10, x, y))
+        run.resetCalls()
+        for i in range(1000):
+            x += 1
+            start = time.perf_counter()
+            handler.mouseMove(makeEvent(eventClass, 10, 10, x, y))
+            dragSamples.append(time.perf_counter() - start)
+            run.advance(8, pet)
+        handler.releaseLeft(makeEvent(eventClass, 10, 10, x, y))
+        run.record(f"render.{backend}.dragBubble", dragSamples, run.tkCalls())
+        ui.close_popup()
+        closePet(pet)
+
+# a classroom server on localhost with many clients posting at once: post latency,
+# "class progress" query latency under that load and how many commits it took
+def benchSync(run):
+    import threading
+    import urllib.request
+    from syncServer import ClassroomServer
+
+    server = ClassroomServer(("127.0.0.1", 0), "classroom.db")
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    postSamples = []
+    querySamples = []
+    posting = threading.Event()
+    day = time.strftime("%Y-%m-%d")
+
+    def client(index):
+        for request in range(5):
+            events = [[1e9 + index * 100 + request * 10 + k, 250, day] for k in range(5)]
+            body = json.dumps({"student": f"student{index}", "goal": 2000, "events": events}).encode("utf-8")
+            start = time.perf_counter()
+            with urllib.request.urlopen(urllib.request.Request(url + "/events", data=body, method="POST")) as response:
+                response.read()
+            postSamples.append(time.perf_counter() - start)
+
+    def poll():
+        while posting.is_set():
+            start = time.perf_counter()
+            with urllib.request.urlopen(url + "/progress") as response:
+                response.read()
+            querySamples.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    posting.set()
+    poller = threading.Thread(target=poll)
+    poller.start()
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(200)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    posting.clear()
+    poller.join()
+    run.record("sync.post", postSamples, transactions=server.writer.transactions,
+               events=server.writer.eventsWritten)
+    run.record("sync.progress", querySamples)
+    server.shutdown()
+    server.server_close()
+
+def makeEvent(eventClass, x, y, xRoot, yRoot):
+    if eventClass is not None:
+        return eventClass(x=x, y=y, x_root=xRoot, y_root=yRoot)
+    event = type("Event", (), {})()
+    event.x, event.y, event.x_root, event.y_root = x, y, xRoot, yRoot
+    return event
+
+def benchConfigSave(run):
+    from configManager import ConfigManager
+
+    config = ConfigManager()
+    samples = []
+    for i in range(run.repeat * 10):
+        start = time.perf_counter()
+        config.dailyGoal = 2000 + i
+        samples.append(time.perf_counter() - start)
+    run.record("config.save", samples, writes=config.writer.writes)
+
+    flushSamples = []
+    for i in range(run.repeat):
+        config.sipAmount = 250 + i
+        start = time.perf_counter()
+        config.flush()
+        flushSamples.append(time.perf_counter() - start)
+    run.record("config.flush", flushSamples)
+
+    addSamples = []
+    for _ in range(run.repeat * 10):
+        start = time.perf_counter()
+        config.addIntake(250)
+        addSamples.append(time.perf_counter() - start)
+    run.record("config.addIntake", addSamples)
+    config.close()
+
+def benchOpenSetup(run):
+    pet = makePet()
+    samples = []
+    run.resetCalls()
+    for _ in range(run.repeat):
+        start = time.perf_counter()
+        pet.openSetupWindow()
+        samples.append(time.perf_counter() - start)
+    run.record("ui.openSetup", samples, run.tkCalls())
+    closePet(pet)
+
+# the Tk thread's share of opening preferences with nothing cached: the files are read
+# on the I/O workers, so only decoding lands on it
+def benchIo(run):
+    import imageCache
+    from UIManager import BACKGROUND_SCALE
+    pet = makePet()
+    pet.start()
+    run.advance(1000, pet)
+    run.settle(pet)
+    ui = pet.uiManager
+    ui.hidePreferences()
+    samples = []
+    arrivals = []
+    for _ in range(run.repeat):
+        imageCache.imageCache.discard(("sprite", "background", BACKGROUND_SCALE))
+        imageCache.imageCache.discard(("frame", "background", BACKGROUND_SCALE, 0))
+        start = time.perf_counter()
+        pet.openSetupWindow()
+        samples.append(time.perf_counter() - start)
+        run.settle(pet)
+        arrivals.append(time.perf_counter() - start)
+        ui.hidePreferences()
+    run.record("io.openSetup.cold", samples, run.tkCalls())
+    run.record("io.openSetup.backgroundShown", arrivals)
+    closePet(pet)
+
+SCENARIOS = {
+    "startup": benchStartup,
+    "tick": benchAnimationTick,
+    "pacing": benchPacing,
+    "pets": benchPets,
+    "drag": benchDrag,
+    "renderer": benchRenderer,
+    "config": benchConfigSave,
+    "sync": benchSync,
+    "setup": benchOpenSetup,
+    "io": benchIo,
+}
+
+def startXvfb():
+    if shutil.which("Xvfb") is None:
+        return None
+    process = subprocess.Popen(["Xvfb", XVFB_DISPLAY, "-screen", "0", "1920x1080x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = XVFB_DISPLAY
+    return process
+
+# runs the scenarios inside a scratch directory so config.json and caches stay untouched
+def runScenarios(names, repeat, useXvfb):
+    xvfb = startXvfb() if useXvfb else None
+    if useXvfb and xvfb is None:
+        print("Xvfb not found, using the recording Tk stand-in", file=sys.stderr)
+
+    fake = None
+    if xvfb is None:
+        import fakeTk
+        fakeTk.install()
+        fake = fakeTk
+        import scheduler
+        scheduler.monotonicMs = fakeTk.loop.now
+
+    workDir = tempfile.mkdtemp(prefix="dew-bench-")
+    oldDir = os.getcwd()
+    os.symlink(os.path.join(REPO_DIR, "assets"), os.path.join(workDir, "assets"))
+    os.chdir(workDir)
+    try:
+        run = BenchmarkRun(fake, repeat)
+        for name in names:
+            SCENARIOS[name](run)
+            for path in os.listdir("."):
+                if path.startswith(("config", "intake_", "classroom")):
+                    os.remove(path)
+        return run.results, ("xvfb" if xvfb is not None else "fake")
+    finally:
+        os.chdir(oldDir)
+        shutil.rmtree(workDir, ignore_errors=True)
+        if xvfb is not None:
+            xvfb.terminate()
+
+def printResults(results):
+    print(f"{'operation':<26}{'mean us':>12}{'p50 us':>12}{'p95 us':>12}  tk calls/op")
+    for name, result in results.items():
+        calls = result.get("tkCalls")
+        callText = "-" if calls is None else f"{sum(calls.values()):.2f}"
+        print(f"{name:<26}{result['mean_us']:>12.2f}{result['p50_us']:>12.2f}{result['p95_us']:>12.2f}  {callText}")
+    for name, result in results.items():
+        if "wakeupsPerMinute" in result:
+            print(f"{name:<26}{result['wakeupsPerMinute']:>12.1f} wakeups/min")
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'operation':<26}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            print(f"{name:<26}{'-':>14}{result['mean_us']:>14.2f}{'new':>10}")
+            continue
+        change = (result["mean_us"] - previous["mean_us"]) / max(previous["mean_us"], 1e-9)
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<26}{previous['mean_us']:>14.2f}{result['mean_us']:>14.2f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+        oldCalls = sum((previous.get("tkCalls") or {}).values())
+        newCalls = sum((result.get("tkCalls") or {}).values())
+        if newCalls > oldCalls + 1e-9 and previous.get("tkCalls") is not None:
+            print(f"{'':<26}tk calls/op {oldCalls:.2f} -> {newCalls:.2f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Dew benchmarks")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--xvfb", action="store_true", help="use real Tk on Xvfb when available")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    parser.add_argument("--baseline", default=PATH_BASELINE)
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    results, backend = runScenarios(names, args.repeat, args.xvfb)
+    printResults(results)
+
+    regressions = []
+    if args.compare:
+        try:
+            with open(args.baseline, "r") as fp:
+                regressions = compare(results, json.load(fp), args.threshold)
+        except (OSError, json.JSONDecodeError):
+            print(f"no readable baseline at {args.baseline}", file=sys.stderr)
+
+    if args.save:
+        document = {
+            "backend": backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.baseline, "w") as fp:
+            json.dump(document, fp, indent=2, sort_keys=True)
+            fp.write("\n")
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
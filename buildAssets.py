@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import tkinter as tk
+from assetManifest import PATH_ASSETS, PATH_ASSET_SPEC, PATH_BUILD, PATH_MANIFEST, loadJson, scaleName
+from gifInfo import readGifFile
+from persistence import writeAtomic
+from spriteCache import decodeFrames
+
+MANIFEST_VERSION = 1
+
+# Offline build step: turns the GIFs listed in assets/assets.json into pre-scaled,
+# horizontal strip sprite sheets plus a manifest of frame counts, durations and sizes.
+# Run it whenever an asset changes:  python buildAssets.py
+
+def buildSheet(frames, path):
+    frameWidth, frameHeight = frames[0].width(), frames[0].height()
+    sheet = tk.PhotoImage(width=frameWidth * len(frames), height=frameHeight)
+    for i, frame in enumerate(frames):
+        sheet.tk.call(sheet, "copy", frame, "-to", i * frameWidth, 0)
+    sheet.write(path, format="png")
+    return frameWidth, frameHeight
+
+def buildAsset(name, spec, assetsDir, outDir):
+    source = os.path.join(assetsDir, spec["source"])
+    info = readGifFile(source)
+    frameCount = min(spec.get("frames") or info["frames"], info["frames"])
+
+    entry = {
+        "source": spec["source"],
+        "sourceMtime": os.stat(source).st_mtime_ns,
+        "spec": spec,
+        "frames": frameCount,
+        "durations": info["durations"][:frameCount],
+        "width": info["width"],
+        "height": info["height"],
+        "sheets": {},
+    }
+    for scale in spec.get("scales", [1]):
+        frames = decodeFrames(source, frameCount, scale)
+        fileName = f"{name}@{scaleName(scale)}.png"
+        frameWidth, frameHeight = buildSheet(frames, os.path.join(outDir, fileName))
+        entry["sheets"][scaleName(scale)] = {
+            "path": fileName,
+            "frames": frameCount,
+            "frameWidth": frameWidth,
+            "frameHeight": frameHeight,
+        }
+    return entry
+
+def isUpToDate(entry, spec, assetsDir, outDir):
+    if entry is None or entry.get("spec") != spec:
+        return False
+    try:
+        if os.stat(os.path.join(assetsDir, spec["source"])).st_mtime_ns != entry["sourceMtime"]:
+            return False
+    except OSError:
+        return False
+    return all(os.path.exists(os.path.join(outDir, sheet["path"])) for sheet in entry["sheets"].values())
+
+def main():
+    parser = argparse.ArgumentParser(description="Build pre-scaled sprite sheets and the asset manifest")
+    parser.add_argument("--assets", default=PATH_ASSETS, help="directory holding the source assets")
+    parser.add_argument("--spec", default=PATH_ASSET_SPEC)
+    parser.add_argument("--out", default=PATH_BUILD, help="directory for the sheets and manifest")
+    parser.add_argument("--force", action="store_true", help="rebuild every asset")
+    args = parser.parse_args()
+
+    spec = loadJson(args.spec)
+    if spec is None:
+        print(f"no asset spec at {args.spec}", file=sys.stderr)
+        return 1
+
+    manifestPath = os.path.join(args.out, os.path.basename(PATH_MANIFEST))
+    previous = (loadJson(manifestPath) or {}).get("assets", {})
+    os.makedirs(args.out, exist_ok=True)
+
+    # PhotoImage needs an interpreter; the window itself is never shown
+    root = tk.Tk()
+    root.withdraw()
+
+    assets = {}
+    for name, assetSpec in spec.items():
+        if not os.path.exists(os.path.join(args.assets, assetSpec["source"])):
+            print(f"skip {name}: {assetSpec['source']} not found")
+            continue
+        if not args.force and isUpToDate(previous.get(name), assetSpec, args.assets, args.out):
+            assets[name] = previous[name]
+            print(f"keep {name}")
+            continue
+        assets[name] = buildAsset(name, assetSpec, args.assets, args.out)
+        print(f"built {name}: {assets[name]['frames']} frames at {', '.join(assets[name]['sheets'])}")
+
+    root.destroy()
+    writeAtomic(manifestPath, json.dumps({"version": MANIFEST_VERSION, "assets": assets}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
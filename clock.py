@@ -0,0 +1,36 @@
+import time
+from datetime import date
+
+# Where the pet gets the time from. Everything that reads wall-clock or monotonic time
+# takes a clock, so a simulation can swap in SimulatedClock and skip ahead freely.
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    def today(self) -> date:
+        return date.fromtimestamp(time.time())
+
+    def monotonicMs(self) -> float:
+        return time.monotonic() * 1000
+
+# Stands still until advanced. Wall and monotonic time move together.
+class SimulatedClock:
+    def __init__(self, start: float):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def today(self) -> date:
+        return date.fromtimestamp(self.now)
+
+    def monotonicMs(self) -> float:
+        return self.now * 1000
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def advanceTo(self, timestamp: float):
+        self.now = max(self.now, timestamp)
+
+systemClock = SystemClock()
@@ -1,25 +1,66 @@
 import json
 import os
-from datetime import date
-import time
+import threading
+from persistence import WriteBehindWriter
+from fileLock import FileLock, FileWatcher
+from clock import systemClock
+from intakeHistory import IntakeHistory, PATH_INTAKE_INDEX, PATH_INTAKE_LOG
+from reminders import DEFAULT_REMINDER_RULES
+from renderer import RENDERER_LABEL
 
 DEFAULT_DAILY_GOAL = 2000
 DEFAULT_SIP_AMOUNT = 250
+DEFAULT_IMAGE_CACHE_BUDGET_MB = 48
 PATH_CONFIG = "config.json"
+MISSING = object()
 DEFAULT_CONFIG = {
     "dailyGoal": DEFAULT_DAILY_GOAL,
     "sipAmount": DEFAULT_SIP_AMOUNT,
     "currentIntake": 0,
     "lastResetDate": None,
     "streak": 0,
-    "lastIntakeTime": 0
+    "lastIntakeTime": 0,
+    "imageCacheBudgetMB": DEFAULT_IMAGE_CACHE_BUDGET_MB,
+    "prewarmWindows": True,
+    "adaptivePacing": True,
+    "reminderRules": DEFAULT_REMINDER_RULES,
+    "metricsEnabled": False,
+    "metricsOverlay": False,
+    "progressiveStartup": True,
+    "renderer": RENDERER_LABEL,
+    "progressRing": True,
+    "syncServer": None,
+    "syncStudent": None
 }
 
+# per-profile file name, e.g. config-alice.json; no profile keeps the plain name
+def profilePath(path, profile):
+    if profile is None:
+        return path
+    base, extension = os.path.splitext(path)
+    return f"{base}-{profile}{extension}"
+
 class ConfigManager:
-    def __init__(self):
+    # history replaces the on-disk intake history, e.g. with an in-memory one
+    def __init__(self, profile=None, clock=None, history=None):
+        self.clock = clock or systemClock
+        self.today = None
+        self.path = profilePath(PATH_CONFIG, profile)
         self.data = DEFAULT_CONFIG.copy()
+        # what this instance last saw on disk, and the local changes not yet merged into it
+        self.baseline = {}
+        self.pendingChanges = {}
+        self.changesLock = threading.Lock()
+        self.writer = WriteBehindWriter(self.path, fileLock=FileLock(self.path + ".lock"))
+        self.history = history or IntakeHistory(profilePath(PATH_INTAKE_LOG, profile),
+                                                profilePath(PATH_INTAKE_INDEX, profile))
         self.load()
+        self.watcher = FileWatcher(self.path)
+        self.migrateToHistory()
         self.resetOnNewDay()
+        self.sync = None
+        if self.syncServer:
+            self.startSync(profile)
 
     @property
     def dailyGoal(self) -> int:
@@ -48,47 +89,200 @@ class ConfigManager:
         self.data["lastIntakeTime"] = value
         self.save()
 
+    @property
+    def imageCacheBudgetMB(self) -> int:
+        return self.data.get("imageCacheBudgetMB", DEFAULT_IMAGE_CACHE_BUDGET_MB)
+
+    @property
+    def prewarmWindows(self) -> bool:
+        return self.data.get("prewarmWindows", True)
+
+    @property
+    def adaptivePacing(self) -> bool:
+        return self.data.get("adaptivePacing", True)
+
+    @property
+    def reminderRules(self) -> list:
+        return self.data.get("reminderRules", DEFAULT_REMINDER_RULES)
+
+    @property
+    def metricsEnabled(self) -> bool:
+        return self.data.get("metricsEnabled", False)
+
+    @property
+    def metricsOverlay(self) -> bool:
+        return self.data.get("metricsOverlay", False)
+
+    @property
+    def progressiveStartup(self) -> bool:
+        return self.data.get("progressiveStartup", True)
+
+    @property
+    def renderer(self) -> str:
+        return self.data.get("renderer", RENDERER_LABEL)
+
+    @property
+    def progressRing(self) -> bool:
+        return self.data.get("progressRing", True)
+
+    @property
+    def syncServer(self) -> str:
+        return self.data.get("syncServer")
+
+    @property
+    def syncStudent(self) -> str:
+        return self.data.get("syncStudent")
+
     @property
     def currentIntake(self) -> int:
         return self.data["currentIntake"]
 
     def addIntake(self, amount: int):
-        self.data["currentIntake"] += amount
-        self.data["lastIntakeTime"] = time.time()
+        now = self.clock.time()
+        # set before the append notifies listeners, so the reminders count from this sip
+        self.data["lastIntakeTime"] = now
+        self.history.append(now, amount)
+        self.data["currentIntake"] = self.history.dayTotal(now)
         self.save()
 
     @property
     def streak(self) -> int:
         return self.data["streak"]
 
+    # currentIntake and streak are derived from the intake history; the copies in
+    # config.json are only a cache for readers of the file
     def resetOnNewDay(self):
-        currentDate = date.today().isoformat()
+        today = self.clock.today()
+        self.today = today
+        currentDate = today.isoformat()
         lastResetDate = self.data["lastResetDate"]
+        currentIntake = self.history.dayTotal(today)
+        streak = self.history.streak(today, self.data["dailyGoal"])
+        changed = currentIntake != self.data["currentIntake"] or streak != self.data["streak"]
 
+        self.data["currentIntake"] = currentIntake
+        self.data["streak"] = streak
         if lastResetDate is not None and lastResetDate != currentDate:
-            if self.data["currentIntake"] >= self.data["dailyGoal"]:
-                self.data["streak"] += 1
-            else:
-                self.data["streak"] = 0
-            self.data["currentIntake"] = 0
             self.data["lastResetDate"] = currentDate
+            changed = True
+        if changed:
             self.save()
 
+    def migrateToHistory(self):
+        if not self.history.isEmpty():
+            return
+        if self.data["currentIntake"] > 0 or self.data["streak"] > 0:
+            timestamp = self.data.get("lastIntakeTime") or self.clock.time()
+            self.history.importLegacy(timestamp, self.data["currentIntake"], self.data["streak"])
+
+    # pushes sips to a classroom server; only loaded when one is configured
+    def startSync(self, profile):
+        import getpass
+        from syncClient import PATH_SYNC_STATE, SyncClient
+        student = self.syncStudent or profile or getpass.getuser()
+        self.sync = SyncClient(self.syncServer, student, self.history, lambda: self.dailyGoal,
+                               profilePath(PATH_SYNC_STATE, profile))
+        self.sync.start()
+
     def load(self):
-        if os.path.exists(PATH_CONFIG):
+        if os.path.exists(self.path):
             try:
-                with open(PATH_CONFIG, "r") as fp:
+                with open(self.path, "r") as fp:
                     data = json.load(fp)
                 self.data.update(data)
+                self.baseline = dict(self.data)
             except (json.JSONDecodeError, OSError):
+                # keep the unreadable file around instead of silently overwriting it
+                try:
+                    os.replace(self.path, self.path + ".corrupt")
+                except OSError:
+                    pass
                 self.data = DEFAULT_CONFIG.copy()
+                self.baseline = dict(self.data)
                 self.save()
         else:
+            # defaults are not changes; they only fill in keys the file lacks
+            self.baseline = dict(self.data)
             self.save()
 
-    def save(self):
+    def readFile(self):
         try:
-            with open(PATH_CONFIG, "w") as fp:
-                json.dump(self.data, fp)
-        except OSError:
-            pass
+            with open(self.path, "r") as fp:
+                data = json.load(fp)
+            return data if isinstance(data, dict) else None
+        except (json.JSONDecodeError, OSError):
+            return None
+
+    # queues the keys changed since the last save; the writer thread merges them into
+    # the file under the lock, so settings saved by another instance are kept
+    def save(self):
+        with self.changesLock:
+            for key, value in self.data.items():
+                if self.baseline.get(key, MISSING) != value:
+                    self.pendingChanges[key] = value
+                    self.baseline[key] = value
+        self.writer.submit(self.mergeOnDisk)
+
+    def mergeOnDisk(self):
+        with self.changesLock:
+            changes = self.pendingChanges
+            self.pendingChanges = {}
+        disk = self.readFile()
+        merged = dict(disk or {})
+        for key, value in DEFAULT_CONFIG.items():
+            merged.setdefault(key, value)
+        lastIntakeTime = max(merged.get("lastIntakeTime") or 0, changes.get("lastIntakeTime") or 0)
+        merged.update(changes)
+        merged["lastIntakeTime"] = lastIntakeTime
+        if merged == disk:
+            return None
+        return json.dumps(merged)
+
+    # the disk half of refresh: reads the sips other instances logged and the config
+    # file when it moved. It leaves the settings and the index alone, so it can run
+    # on an I/O worker.
+    def pollDisk(self):
+        writes = self.writer.writes
+        disk = self.readFile() if self.watcher.changed() else None
+        return self.history.pollTail(), disk, writes
+
+    # picks up what other instances wrote: sips through the history's log offset and
+    # settings when the config file's inode, size or mtime moved. polled is what an
+    # earlier pollDisk found; without it the disk is read here.
+    def refresh(self, polled=None) -> bool:
+        tail, disk, writes = polled or self.pollDisk()
+        if disk is not None and writes != self.writer.writes:
+            # our own save landed after the read; older values would undo it
+            self.watcher.reset()
+            disk = None
+        changed = self.history.refresh(tail)
+        if changed:
+            self.data["currentIntake"] = self.history.dayTotal(self.today)
+            self.data["lastIntakeTime"] = max(self.lastIntakeTime, self.history.lastTimestamp)
+        if self.clock.today() != self.today:
+            # still running past midnight
+            self.resetOnNewDay()
+            changed = True
+
+        if disk is not None:
+            with self.changesLock:
+                external = {key: value for key, value in disk.items()
+                            if key not in self.pendingChanges and self.baseline.get(key, MISSING) != value}
+                self.baseline.update(external)
+            if "lastIntakeTime" in external:
+                external["lastIntakeTime"] = max(external["lastIntakeTime"] or 0, self.lastIntakeTime)
+            # derived from the history, whatever the file says
+            external.pop("currentIntake", None)
+            self.data.update(external)
+            changed = changed or bool(external)
+        return changed
+
+    def flush(self):
+        self.writer.flush()
+        self.history.flush()
+
+    def close(self):
+        if self.sync is not None:
+            self.sync.close()
+        self.writer.close()
+        self.history.close()
@@ -0,0 +1,43 @@
+import tkinter as tk
+from metrics import metrics
+
+OVERLAY_REFRESH = 1000   # ms
+OVERLAY_OFFSET = 8       # px below the pet
+
+def formatMs(value):
+    return "-" if value is None else f"{value:.2f}"
+
+# Small always-on-top readout of the live metrics, kept just under the pet.
+# Only created when metricsOverlay is set in the config.
+class DebugOverlay:
+    def __init__(self, pet):
+        self.pet = pet
+        self.timer = None
+        self.window = tk.Toplevel(pet.window)
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+        self.label = tk.Label(self.window, justify="left", font=("Courier", 9),
+                              bg="black", fg="#7CFC00", padx=4, pady=2)
+        self.label.pack()
+
+    def start(self):
+        self.refresh()
+
+    def stop(self):
+        self.pet.scheduler.cancel(self.timer)
+        self.timer = None
+        self.window.destroy()
+
+    def refresh(self):
+        tick = metrics.histogram("tick")
+        save = metrics.histogram("config.save")
+        drag = metrics.histogram("drag.motionEvent")
+        lines = [
+            f"tick  p50 {formatMs(tick.percentile(0.5))}  p95 {formatMs(tick.percentile(0.95))} ms",
+            f"save  p95 {formatMs(save.percentile(0.95))} ms",
+            f"drag  {drag.count} events",
+            f"wake  {self.pet.scheduler.wakeupsPerMinute()}/min  {self.pet.pacer.mode}",
+        ]
+        self.label.configure(text="\n".join(lines))
+        self.window.geometry(f"+{self.pet.x}+{self.pet.y + self.pet.petHeight + OVERLAY_OFFSET}")
+        self.timer = self.pet.scheduler.schedule(OVERLAY_REFRESH, self.refresh)
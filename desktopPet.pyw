@@ -4,47 +4,120 @@ from behaviourManager import BehaviourManager
 from configManager import ConfigManager
 from animationManger import AnimationManager
 from mouseManager import MouseHandler
+from imageCache import imageCache
+from renderer import makeRenderer
+from scheduler import Scheduler
+from pacing import PACE_ASLEEP, Pacer, PacingPolicy
+from reminders import ReminderEngine
+from metrics import METRICS_INTERVAL, metrics
+from clock import systemClock
+from ioPool import IoPool
 
 FRAME_WIDTH = 20
 FRAME_HEIGHT = 600
 DELAY_SETUP_WINDOW = 500
 DELAY_FRAME_STEP = 1
+DELAY_PREWARM = 2000
+DELAY_CONFIG_CHECK = 2000
 
 class DesktopPet:
-    def __init__(self):
+    # host is a PetHost when several pets share one Tk root; profile picks the
+    # config and intake files; clock replaces the real time, e.g. in simulations
+    def __init__(self, host=None, profile=None, x=FRAME_WIDTH, y=FRAME_HEIGHT, clock=None):
+        metrics.beginStartup()
         # init components
-        self.x = FRAME_WIDTH
-        self.y = FRAME_HEIGHT
+        self.host = host
+        self.clock = clock
+        self.profile = profile
+        self.x = x
+        self.y = y
         self.animation = AnimationManager()
         self.behaviour = BehaviourManager()
         self.mouseHandler = MouseHandler(self)
         self.uiManager = UIManager(self)
+        self.overlay = None
+        metrics.mark("components")
         # init window
         self.window = None
         self.label = None
+        self.renderer = None
+        self.scheduler = None
+        self.io = None
+        self.animationTimer = None
+        self.decodeFuture = None
+        self.configPoll = None
+        self.pacer = None
+        self.reminders = None
+        self.positionListeners = []
+        self.nextConfigCheck = 0
         self.petWidth = 0
         self.petHeight = 0
         self.config = None
         self.setupWindow()
+        metrics.mark("ready")
 
     def setupWindow(self):
-        self.window = tk.Tk()
-        self.animation.loadAnimations()
+        if self.host is None:
+            self.window = tk.Tk()
+            self.scheduler = Scheduler(self.window, clock = self.clock.monotonicMs if self.clock else None)
+            self.io = IoPool(self.window, self.scheduler)
+        else:
+            self.window = tk.Toplevel(self.host.root)
+            self.scheduler = self.host.scheduler
+            self.io = self.host.io
+        metrics.mark("window")
+
+        self.config = ConfigManager(self.profile, self.clock)
+        imageCache.setBudget(self.config.imageCacheBudgetMB * 1024 * 1024)
+        if self.config.metricsEnabled or self.config.metricsOverlay:
+            self.enableMetrics()
+        metrics.mark("config")
+
+        self.animation.loadAnimations(progressive = self.config.progressiveStartup)
         self.petWidth, self.petHeight = self.animation.getDimensions()
+        metrics.mark("sprites")
 
         self.window.config(highlightbackground = 'black')
         self.window.overrideredirect(True) # removes border
-        self.window.wm_attributes('-transparentcolor', 'black') # todo: change transparent colour
+        try:
+            self.window.wm_attributes('-transparentcolor', 'black') # todo: change transparent colour
+        except tk.TclError:
+            pass # only supported on Windows
         self.window.wm_attributes('-topmost', True)
 
-        self.label = tk.Label(self.window, bd = 0, bg = 'black')
-        self.label.pack()
+        self.renderer = makeRenderer(self.config.renderer, self.window)
+        # the widget the pet is drawn on, a Label or a Canvas; mouse events bind to it
+        self.label = self.renderer.widget
+        self.renderer.registerFrames(self.animation.getLoadedFrames())
+        # the window maps with this frame as soon as the event loop runs
+        self.renderer.showFrame(self.animation.getFirstFrame())
 
-        self.config = ConfigManager()
+        self.pacer = Pacer(PacingPolicy(enabled = self.config.adaptivePacing), self.scheduler.now)
+        self.reminders = ReminderEngine(self.scheduler, self.config, self.uiManager.showPopUp,
+                                        self.config.reminderRules, (self.clock or systemClock).time)
         self.bindMouseEvents()
+        self.bindVisibilityEvents()
 
         # modify this line to change the spawn position
-        self.window.geometry(f'{self.petWidth}x{self.petHeight}+{self.x}+{self.y}')
+        self.renderer.moveTo(self.x, self.y, self.petWidth, self.petHeight)
+        metrics.mark("firstFrame")
+
+    # swaps the hot methods for timed wrappers; nothing is wrapped unless enabled
+    def enableMetrics(self):
+        metrics.enable()
+        self.step = metrics.timed("tick", self.step)
+        self.config.save = metrics.timed("config.save", self.config.save)
+        # save() only queues the change; the disk write happens on the writer thread
+        self.config.writer.writePending = metrics.timed("config.write", self.config.writer.writePending)
+        self.mouseHandler.mouseMove = metrics.timed("drag.motionEvent", self.mouseHandler.mouseMove)
+        self.mouseHandler.applyDrag = metrics.timed("drag.applied", self.mouseHandler.applyDrag)
+        metrics.addGauge("wakeupsPerMinute", self.scheduler.wakeupsPerMinute)
+        metrics.addGauge("pacing", lambda: self.pacer.mode)
+        metrics.addGauge("imageCacheBytes", lambda: imageCache.usedBytes)
+
+    def exportMetrics(self):
+        metrics.export()
+        self.scheduler.schedule(METRICS_INTERVAL * 1000, self.exportMetrics)
 
     def bindMouseEvents(self):
         self.label.bind("<Button-1>", self.mouseHandler.pressLeft)
@@ -54,19 +127,104 @@ class DesktopPet:
         self.label.bind("<Leave>", self.mouseHandler.endHover)
         self.label.bind("<Button-3>", self.mouseHandler.openSetup)
 
+    def bindVisibilityEvents(self):
+        self.window.bind("<Map>", self.onMap)
+        self.window.bind("<Unmap>", lambda event: self.setVisible(False))
+        self.label.bind("<Visibility>",
+                        lambda event: self.setVisible(event.state != "VisibilityFullyObscured"))
+
+    def onMap(self, event):
+        if metrics.sinceStart("mapped") is None:
+            # time to first pixel, as far as Tk can tell
+            metrics.mark("mapped")
+        self.setVisible(True)
+
+    # decodes the remaining sprites one per idle slot, after the window is up; each
+    # sprite's files are read on an I/O worker first, so the decode never waits on disk
+    def decodeRemaining(self):
+        self.decodeFuture = self.animation.prefetchNextSprite(self.io, self.decodeNext)
+
+    def decodeNext(self):
+        self.decodeFuture = None
+        if self.animation.loadNextSprite():
+            self.renderer.registerFrames(self.animation.getLoadedFrames())
+            self.window.after_idle(self.decodeRemaining)
+
+    def setVisible(self, visible):
+        self.pacer.setVisible(visible)
+        if visible:
+            self.wakeAnimation()
+
+    # any interaction with the pet ends idle pacing straight away
+    def noteInput(self):
+        self.pacer.noteInput()
+        self.wakeAnimation()
+
+    def wakeAnimation(self):
+        if not self.pacer.isResting():
+            return
+        if self.host is not None:
+            self.host.wake(self)
+        elif self.animationTimer is not None:
+            self.scheduler.cancel(self.animationTimer)
+            self.animationTimer = self.scheduler.schedule(DELAY_FRAME_STEP, self.updateAnimation)
+
     def updateAnimation(self):
+        self.animationTimer = self.scheduler.schedule(self.step(), self.updateAnimation)
+
+    # draws the next frame and returns the delay until the one after it
+    def step(self):
+        # finished disk work, e.g. the last config poll
+        self.io.pump()
+        # another instance may have logged a sip or changed a setting
+        now = self.scheduler.now()
+        if now >= self.nextConfigCheck:
+            self.nextConfigCheck = now + DELAY_CONFIG_CHECK
+            self.pollConfig()
+
         newState = self.behaviour.getBehaviour()
+        mode = self.pacer.update(newState, self.window)
+        if mode == PACE_ASLEEP:
+            # nothing worth drawing; just check back for the user now and then
+            return self.pacer.policy.probeMs
+
         self.animation.setState(newState)
+        if self.config.progressRing:
+            self.renderer.setProgress(self.config.currentIntake / max(1, self.config.dailyGoal))
 
         frame = self.animation.getCurrFrame()
 
-        if not self.behaviour.isDragging:
-            # update window position
-            self.window.geometry(f'{self.petWidth}x{self.petHeight}+{self.x}+{self.y}')
+        # the drag handler owns the window position while dragging
+        moved = self.renderer.render(frame, self.x, self.y, self.petWidth, self.petHeight,
+                                     updatePosition = not self.behaviour.isDragging())
+        if moved:
+            self.publishPosition()
+        return self.pacer.policy.frameDelay(mode, self.animation.getAnimSpeed())
+
+    # the stat calls and reads happen on an I/O worker; what they found is applied
+    # back on the Tk thread. One poll at a time is enough. The ticks pick up the
+    # result, unless a window that wants it soon asks for it promptly.
+    def pollConfig(self, prompt=False):
+        if self.configPoll is None:
+            self.configPoll = self.io.submit(self.config.pollDisk, onDone=self.applyConfigPoll, prompt=prompt)
+
+    def applyConfigPoll(self, polled):
+        self.configPoll = None
+        if self.config.refresh(polled):
+            self.reminders.reschedule()
+            self.uiManager.onConfigChanged()
+
+    def subscribePosition(self, callback):
+        if callback not in self.positionListeners:
+            self.positionListeners.append(callback)
+
+    def unsubscribePosition(self, callback):
+        if callback in self.positionListeners:
+            self.positionListeners.remove(callback)
 
-        self.label.configure(image = frame)
-        speed = self.animation.getAnimSpeed()
-        self.window.after(speed, self.updateAnimation)
+    def publishPosition(self):
+        for callback in list(self.positionListeners):
+            callback(self.x, self.y)
 
     def openSetupWindow(self):
         self.uiManager.openSetup()
@@ -74,14 +232,46 @@ class DesktopPet:
     def openLoggingWindow(self):
         self.uiManager.openLog()
 
-    def run(self):
+    def start(self):
+        if self.config.progressiveStartup:
+            self.window.after_idle(self.decodeRemaining)
         if self.config.data.get("lastResetDate") is None:
-            self.window.after(DELAY_SETUP_WINDOW, self.openSetupWindow)
+            self.scheduler.schedule(DELAY_SETUP_WINDOW, self.openSetupWindow)
+        # a host would prewarm a set of windows per pet; they are built on first use there
+        if self.config.prewarmWindows and self.host is None:
+            self.scheduler.schedule(DELAY_PREWARM, self.uiManager.prewarm)
+
+        if metrics.enabled and self.host is None:
+            self.scheduler.schedule(METRICS_INTERVAL * 1000, self.exportMetrics)
+        if self.config.metricsOverlay:
+            from debugOverlay import DebugOverlay
+            self.overlay = DebugOverlay(self)
+            self.overlay.start()
 
         # start animation loop
-        self.window.after(DELAY_FRAME_STEP, self.updateAnimation)
+        if self.host is None:
+            self.animationTimer = self.scheduler.schedule(DELAY_FRAME_STEP, self.updateAnimation)
+        else:
+            self.host.attach(self)
+
+    def close(self):
+        self.scheduler.cancel(self.animationTimer)
+        self.io.cancel(self.decodeFuture)
+        self.io.cancel(self.configPoll)
+        if self.host is None:
+            self.io.close()
+        self.reminders.stop()
+        self.config.close()
+
+    def run(self):
+        self.start()
         # start main GUI loop
-        self.window.mainloop()
+        try:
+            self.window.mainloop()
+        finally:
+            metrics.export()
+            self.close()
 
-pet = DesktopPet()
-pet.run()
\ No newline at end of file
+if __name__ == "__main__":
+    pet = DesktopPet()
+    pet.run()
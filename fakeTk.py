@@ -0,0 +1,394 @@
+import heapq
+import itertools
+import struct
+import sys
+import time
+import traceback
+import types
+from gifInfo import GifError, readGifInfo
+
+# A recording stand-in for tkinter, so the pet can be driven on a machine without a
+# display. Every Tk call is counted by name, and after() timers run on a virtual
+# clock that only moves when the driver advances it.
+
+class Recorder:
+    def __init__(self):
+        self.counts = {}
+
+    def record(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        self.counts = {}
+
+    def snapshot(self):
+        return dict(self.counts)
+
+    def total(self):
+        return sum(self.counts.values())
+
+class EventLoop:
+    def __init__(self):
+        self.currentTime = time.monotonic() * 1000
+        self.timers = []
+        self.cancelled = set()
+        self.counter = itertools.count(1)
+        self.pointer = (0, 0)
+
+    def now(self):
+        return self.currentTime
+
+    def after(self, ms, callback):
+        timerId = f"after#{next(self.counter)}"
+        heapq.heappush(self.timers, (self.currentTime + max(0, ms), timerId, callback))
+        return timerId
+
+    def cancel(self, timerId):
+        self.cancelled.add(timerId)
+
+    def advance(self, ms):
+        end = self.currentTime + ms
+        while self.timers and self.timers[0][0] <= end:
+            deadline, timerId, callback = heapq.heappop(self.timers)
+            if timerId in self.cancelled:
+                self.cancelled.discard(timerId)
+                continue
+            self.currentTime = max(self.currentTime, deadline)
+            callback()
+        self.currentTime = end
+
+    def pending(self):
+        return sum(1 for timer in self.timers if timer[1] not in self.cancelled)
+
+recorder = Recorder()
+loop = EventLoop()
+
+class TclError(Exception):
+    pass
+
+class Event:
+    def __init__(self, x=0, y=0, x_root=0, y_root=0, widget=None, state=0):
+        self.state = state
+        self.x = x
+        self.y = y
+        self.x_root = x_root
+        self.y_root = y_root
+        self.widget = widget
+
+class Misc:
+    def __init__(self, master=None, cnf=None, **options):
+        self.master = master
+        self.options = dict(cnf or {}, **options)
+        self.bindings = {}
+        self.destroyed = False
+        self.mapped = True
+        self.geometrySpec = None
+        recorder.record(type(self).__name__)
+
+    # any Tk method without an explicit stand-in is recorded and does nothing
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        def call(*args, **kwargs):
+            recorder.record(name)
+        return call
+
+    def after(self, ms, func=None, *args):
+        recorder.record("after")
+        return loop.after(ms, lambda: func(*args))
+
+    def after_idle(self, func, *args):
+        recorder.record("after_idle")
+        return loop.after(0, lambda: func(*args))
+
+    def after_cancel(self, timerId):
+        recorder.record("after_cancel")
+        loop.cancel(timerId)
+
+    def bind(self, sequence=None, func=None, add=None):
+        recorder.record("bind")
+        self.bindings[sequence] = func
+
+    def configure(self, cnf=None, **options):
+        recorder.record("configure")
+        self.options.update(cnf or {}, **options)
+
+    config = configure
+
+    def cget(self, key):
+        return self.options.get(key)
+
+    def __setitem__(self, key, value):
+        recorder.record("configure")
+        self.options[key] = value
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def geometry(self, spec=None):
+        recorder.record("geometry")
+        if spec is None:
+            return self.geometrySpec or "1x1+0+0"
+        self.geometrySpec = spec
+
+    def withdraw(self):
+        recorder.record("withdraw")
+        self.mapped = False
+
+    def deiconify(self):
+        recorder.record("deiconify")
+        self.mapped = True
+
+    def destroy(self):
+        recorder.record("destroy")
+        self.destroyed = True
+
+    def winfo_exists(self):
+        return not self.destroyed
+
+    def winfo_viewable(self):
+        return self.mapped and not self.destroyed
+
+    def winfo_ismapped(self):
+        return self.mapped and not self.destroyed
+
+    def winfo_pointerx(self):
+        recorder.record("winfo_pointerx")
+        return loop.pointer[0]
+
+    def winfo_pointery(self):
+        recorder.record("winfo_pointery")
+        return loop.pointer[1]
+
+    def winfo_pointerxy(self):
+        recorder.record("winfo_pointerxy")
+        return loop.pointer
+
+    def winfo_width(self):
+        return 1
+
+    def winfo_height(self):
+        return 1
+
+    def winfo_screenwidth(self):
+        return 1920
+
+    def winfo_screenheight(self):
+        return 1080
+
+    def mainloop(self, n=0):
+        pass
+
+class Tk(Misc):
+    def __init__(self, *args, **kwargs):
+        Misc.__init__(self)
+
+    # what Tk prints for an exception in a callback
+    def report_callback_exception(self, exc, val, tb):
+        recorder.record("report_callback_exception")
+        print("Exception in Tkinter callback", file=sys.stderr)
+        traceback.print_exception(exc, val, tb)
+
+class Toplevel(Misc):
+    pass
+
+class Label(Misc):
+    pass
+
+class Frame(Misc):
+    pass
+
+class Button(Misc):
+    pass
+
+class Entry(Misc):
+    pass
+
+class Canvas(Misc):
+    def __init__(self, master=None, cnf=None, **options):
+        Misc.__init__(self, master, cnf, **options)
+        self.items = {}
+        self.itemIds = itertools.count(1)
+
+    def createItem(self, kind, options):
+        recorder.record(f"create_{kind}")
+        itemId = next(self.itemIds)
+        self.items[itemId] = dict(options, kind=kind)
+        return itemId
+
+    def create_image(self, *coords, **options):
+        return self.createItem("image", options)
+
+    def create_rectangle(self, *coords, **options):
+        return self.createItem("rectangle", options)
+
+    def create_oval(self, *coords, **options):
+        return self.createItem("oval", options)
+
+    def create_arc(self, *coords, **options):
+        return self.createItem("arc", options)
+
+    def create_text(self, *coords, **options):
+        return self.createItem("text", options)
+
+    def create_window(self, *coords, **options):
+        return self.createItem("window", options)
+
+    def itemconfigure(self, itemId, **options):
+        recorder.record("itemconfigure")
+        self.items.get(itemId, {}).update(options)
+
+    itemconfig = itemconfigure
+
+class Variable:
+    def __init__(self, master=None, value=None, name=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class IntVar(Variable):
+    def __init__(self, master=None, value=0, name=None):
+        Variable.__init__(self, master, value, name)
+
+class StringVar(Variable):
+    def __init__(self, master=None, value="", name=None):
+        Variable.__init__(self, master, value, name)
+
+def imageSize(data):
+    if data[:3] == b"GIF":
+        return struct.unpack("<HH", data[6:10])
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", data[16:24])
+    raise TclError("couldn't recognize image data")
+
+class Interpreter:
+    def call(self, *args):
+        recorder.record(f"call:{args[1] if len(args) > 1 else args[0]}")
+
+interpreter = Interpreter()
+
+# Only reads image headers: sizes and frame counts are real, pixels are not.
+class PhotoImage:
+    tk = interpreter
+
+    def __init__(self, name=None, cnf=None, master=None, file=None, data=None, format=None,
+                 width=0, height=0, **options):
+        recorder.record("PhotoImage")
+        self.imageWidth = width
+        self.imageHeight = height
+        if file is not None or data is not None:
+            if file is not None:
+                try:
+                    with open(file, "rb") as fp:
+                        data = fp.read()
+                except OSError:
+                    raise TclError(f'couldn\'t open "{file}": no such file or directory')
+            if isinstance(data, str):
+                data = data.encode("latin-1")
+            self.imageWidth, self.imageHeight = imageSize(data)
+            if format and "-index" in format:
+                index = int(format.split("-index")[1])
+                try:
+                    frameCount = readGifInfo(data)["frames"]
+                except GifError:
+                    raise TclError("couldn't recognize image data")
+                if index >= frameCount:
+                    raise TclError(f'no image data for index {index}')
+
+    def width(self):
+        return self.imageWidth
+
+    def height(self):
+        return self.imageHeight
+
+    def zoom(self, x, y=""):
+        recorder.record("zoom")
+        y = y or x
+        return PhotoImage(width=self.imageWidth * x, height=self.imageHeight * y)
+
+    def subsample(self, x, y=""):
+        recorder.record("subsample")
+        y = y or x
+        return PhotoImage(width=-(-self.imageWidth // x), height=-(-self.imageHeight // y))
+
+    def copy(self):
+        recorder.record("copy")
+        return PhotoImage(width=self.imageWidth, height=self.imageHeight)
+
+    def write(self, filename, format=None, from_coords=None):
+        recorder.record("write")
+        header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", self.imageWidth, self.imageHeight)
+        with open(filename, "wb") as fp:
+            fp.write(header)
+
+    def blank(self):
+        recorder.record("blank")
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        def call(*args, **kwargs):
+            recorder.record(name)
+        return call
+
+class Style:
+    def __init__(self, master=None):
+        recorder.record("Style")
+
+    def theme_use(self, name=None):
+        recorder.record("theme_use")
+
+    def configure(self, style, **options):
+        recorder.record("style_configure")
+
+class Font:
+    def __init__(self, root=None, font=None, name=None, exists=False, **options):
+        recorder.record("Font")
+
+def showinfo(title=None, message=None, **options):
+    recorder.record("showinfo")
+
+def showerror(title=None, message=None, **options):
+    recorder.record("showerror")
+
+class Progressbar(Misc):
+    pass
+
+class Scale(Misc):
+    pass
+
+# Puts the stand-in in place of tkinter and its submodules. Must run before any
+# module that imports tkinter.
+def install():
+    tkModule = types.ModuleType("tkinter")
+    for name in ["TclError", "Tk", "Toplevel", "Label", "Frame", "Button", "Entry", "Canvas",
+                 "IntVar", "StringVar", "PhotoImage", "Event"]:
+        setattr(tkModule, name, globals()[name])
+
+    ttkModule = types.ModuleType("tkinter.ttk")
+    ttkModule.Style = Style
+    ttkModule.Scale = Scale
+    ttkModule.Progressbar = Progressbar
+    ttkModule.Button = Button
+    ttkModule.Label = Label
+    ttkModule.Frame = Frame
+
+    messageboxModule = types.ModuleType("tkinter.messagebox")
+    messageboxModule.showinfo = showinfo
+    messageboxModule.showerror = showerror
+
+    fontModule = types.ModuleType("tkinter.font")
+    fontModule.Font = Font
+
+    tkModule.ttk = ttkModule
+    tkModule.messagebox = messageboxModule
+    tkModule.font = fontModule
+    sys.modules["tkinter"] = tkModule
+    sys.modules["tkinter.ttk"] = ttkModule
+    sys.modules["tkinter.messagebox"] = messageboxModule
+    sys.modules["tkinter.font"] = fontModule
+    return tkModule
@@ -0,0 +1,87 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Advisory lock shared between processes through a side file (flock on POSIX,
+# msvcrt.locking on Windows). Re-entrant within a process. Locking is best effort:
+# if the lock file cannot be used the caller carries on unlocked rather than lose data.
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.threadLock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def acquire(self):
+        self.threadLock.acquire()
+        self.depth += 1
+        if self.depth > 1:
+            return
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+        except OSError:
+            self.closeFd()
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self.closeFd()
+        self.threadLock.release()
+
+    def closeFd(self):
+        if self.fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.release()
+
+# Cheap change check for a file another process may rewrite: compares inode, size
+# and mtime from one stat call.
+class FileWatcher:
+    def __init__(self, path):
+        self.path = path
+        self.signature = self.stat()
+
+    def stat(self):
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        return (info.st_ino, info.st_size, info.st_mtime_ns)
+
+    def changed(self):
+        signature = self.stat()
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        return True
+
+    # the next changed() reports a change, e.g. when the last read turned out stale
+    def reset(self):
+        self.signature = None
@@ -0,0 +1,49 @@
+import struct
+
+DEFAULT_FRAME_DURATION = 100   # ms, what browsers use for a zero GIF delay
+
+class GifError(Exception):
+    pass
+
+def skipColorTable(flags, position):
+    if flags & 0x80:
+        position += 3 * (2 << (flags & 0x07))
+    return position
+
+def skipSubBlocks(data, position):
+    while position < len(data) and data[position] != 0:
+        position += data[position] + 1
+    return position + 1
+
+# Reads the logical screen size plus the count and per-frame durations of a GIF by
+# walking its block structure, without decoding any pixels.
+def readGifInfo(data):
+    if data[:3] != b"GIF":
+        raise GifError("not a GIF file")
+    width, height = struct.unpack("<HH", data[6:10])
+    position = skipColorTable(data[10], 13)
+
+    durations = []
+    delay = None
+    while position < len(data):
+        block = data[position]
+        if block == 0x3B:
+            break
+        if block == 0x21:
+            label = data[position + 1]
+            if label == 0xF9 and position + 6 < len(data):
+                delay = struct.unpack("<H", data[position + 4:position + 6])[0] * 10
+            position = skipSubBlocks(data, position + 2)
+        elif block == 0x2C:
+            durations.append(delay or DEFAULT_FRAME_DURATION)
+            delay = None
+            position = skipColorTable(data[position + 9], position + 10)
+            position = skipSubBlocks(data, position + 1)
+        else:
+            raise GifError(f"unexpected block 0x{block:02x}")
+
+    return {"width": width, "height": height, "frames": len(durations), "durations": durations}
+
+def readGifFile(path):
+    with open(path, "rb") as fp:
+        return readGifInfo(fp.read())
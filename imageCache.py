@@ -0,0 +1,180 @@
+import os
+import tkinter as tk
+from collections import OrderedDict
+from assetManifest import AssetManifest, PATH_BUILD
+from spriteCache import SpriteCache, decodeFrame, openImage, prefetched, readFiles, sliceSheet
+from metrics import metrics
+
+DEFAULT_BUDGET = 48 * 1024 * 1024
+BYTES_PER_PIXEL = 4
+
+class CacheEntry:
+    def __init__(self, images, size):
+        self.images = images
+        self.size = size
+        self.pins = 0
+
+# Shared in-memory cache for decoded images. Entries in use are pinned; unpinned
+# entries stay around for reuse until the memory budget forces the least recently
+# used ones out.
+class ImageCache:
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.usedBytes = 0
+        self.spriteCache = None
+        self.manifest = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader, pin=False, sizeOf=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            if metrics.enabled:
+                images = metrics.measure(f"decode.{key[0]}.{os.path.basename(str(key[1]))}", loader)
+            else:
+                images = loader()
+            entry = CacheEntry(images, (sizeOf or imageSize)(images))
+            self.entries[key] = entry
+            self.usedBytes += entry.size
+            self.misses += 1
+        else:
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        if pin:
+            entry.pins += 1
+        self.evict()
+        return entry.images
+
+    def release(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry.pins > 0:
+            entry.pins -= 1
+        self.evict()
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.usedBytes -= entry.size
+
+    def getManifest(self):
+        if self.manifest is None:
+            self.manifest = AssetManifest()
+        return self.manifest
+
+    # frames of a named asset at one scale, from its built sprite sheet when there is
+    # an up to date one, otherwise decoded from the source GIF
+    def getSprite(self, name, scale=1, pin=False):
+        return self.get(("sprite", name, scale), lambda: self.loadSprite(name, scale), pin)
+
+    def releaseSprite(self, name, scale=1):
+        self.release(("sprite", name, scale))
+
+    def loadSprite(self, name, scale):
+        manifest = self.getManifest()
+        sheet = manifest.sheet(name, scale)
+        if sheet is not None:
+            try:
+                return sliceSheet(os.path.join(PATH_BUILD, sheet["path"]), sheet["frames"],
+                                  sheet["frameWidth"], sheet["frameHeight"])
+            except tk.TclError:
+                pass
+
+        return self.getSpriteCache().getFrames(manifest.sourcePath(name), manifest.frameCount(name), scale)
+
+    def getSpriteCache(self):
+        if self.spriteCache is None:
+            self.spriteCache = SpriteCache()
+        return self.spriteCache
+
+    # the files loadSprite would read; stats the disk, so it runs on an I/O worker
+    def spritePaths(self, manifest, spriteCache, name, scale):
+        sheet = manifest.sheet(name, scale)
+        if sheet is not None:
+            return [os.path.join(PATH_BUILD, sheet["path"])]
+        source = manifest.sourcePath(name)
+        return spriteCache.framePaths(source, scale) or [source]
+
+    # reads an asset's files on an I/O worker, then calls onReady on the Tk thread,
+    # where the decode finds them in memory until the next idle slot has run. A read
+    # that fails still calls onReady, which then loads from disk as usual. Returns the
+    # future, or None when the asset is cached already.
+    def prefetch(self, io, key, findPaths, onReady):
+        if key in self.entries:
+            onReady()
+            return None
+        def forget(data):
+            for path in data:
+                prefetched.pop(path, None)
+        def ready(data):
+            prefetched.update(data)
+            try:
+                onReady()
+            finally:
+                io.window.after_idle(forget, data)
+        return io.submit(lambda: readFiles(findPaths()), onDone=ready, onError=lambda error: onReady())
+
+    def prefetchSprite(self, io, name, scale, onReady):
+        # both are shared with the Tk thread, so they are made here rather than on the worker
+        manifest = self.getManifest()
+        spriteCache = self.getSpriteCache()
+        return self.prefetch(io, ("sprite", name, scale),
+                             lambda: self.spritePaths(manifest, spriteCache, name, scale), onReady)
+
+    def prefetchImage(self, io, path, subsample, onReady):
+        return self.prefetch(io, ("image", path, subsample), lambda: [path], onReady)
+
+    # one frame of a sprite, without decoding the others unless they are cached already
+    def getFrame(self, name, scale=1, index=0):
+        entry = self.entries.get(("sprite", name, scale))
+        if entry is not None:
+            return entry.images[index]
+        return self.get(("frame", name, scale, index), lambda: self.loadFrame(name, scale, index))
+
+    def loadFrame(self, name, scale, index):
+        manifest = self.getManifest()
+        sheet = manifest.sheet(name, scale)
+        if sheet is not None:
+            try:
+                return sliceSheet(os.path.join(PATH_BUILD, sheet["path"]), sheet["frames"],
+                                  sheet["frameWidth"], sheet["frameHeight"], [index])[0]
+            except tk.TclError:
+                pass
+        return decodeFrame(manifest.sourcePath(name), index, scale)
+
+    def getImage(self, path, subsample=1, pin=False):
+        def load():
+            image = openImage(path)
+            if subsample != 1:
+                image = image.subsample(subsample, subsample)
+            return image
+        return self.get(("image", path, subsample), load, pin)
+
+    def releaseImage(self, path, subsample=1):
+        self.release(("image", path, subsample))
+
+    def clear(self):
+        self.entries.clear()
+        self.usedBytes = 0
+
+    def setBudget(self, budget):
+        self.budget = budget
+        self.evict()
+
+    def evict(self):
+        if self.usedBytes <= self.budget:
+            return
+        for key in [key for key, entry in self.entries.items() if entry.pins == 0]:
+            self.discard(key)
+            self.evictions += 1
+            if self.usedBytes <= self.budget:
+                break
+
+def imageSize(images):
+    if not isinstance(images, (list, tuple)):
+        images = [images]
+    return sum(image.width() * image.height() * BYTES_PER_PIXEL for image in images)
+
+imageCache = ImageCache()
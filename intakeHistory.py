@@ -0,0 +1,418 @@
+import bisect
+import functools
+import json
+import os
+import threading
+from datetime import date, timedelta
+from persistence import WriteBehindWriter
+from fileLock import FileLock
+
+PATH_INTAKE_LOG = "intake_log.ndjson"
+PATH_INTAKE_INDEX = "intake_index.json"
+
+def dayKey(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, date):
+        return value.isoformat()
+    return quarterDayKey(value // 900)
+
+# every UTC offset is a multiple of 15 minutes, so a quarter hour never spans two days
+@functools.lru_cache(maxsize=4096)
+def quarterDayKey(quarter) -> str:
+    return date.fromtimestamp(quarter * 900).isoformat()
+
+# the totals importLegacy carried over from a pre-history config, not a sip
+def isCarryOver(record) -> bool:
+    return "streak" in record
+
+# What a read of the log found past an offset: the sips, their per-day totals, any
+# carry-over markers and the offset just past the last complete line. base is the
+# history's logSize at the time; the tail only applies while it still is. A tail
+# read from 0 past a bigger base is a log that was replaced.
+class LogTail:
+    def __init__(self, base, start, end=None, records=(), carryOvers=()):
+        self.base = base
+        self.start = start
+        self.end = start if end is None else end
+        self.records = records
+        self.carryOvers = carryOvers
+        self.days = {}
+        self.lastTimestamp = 0
+        for timestamp, amount in records:
+            day = dayKey(timestamp)
+            entry = self.days.get(day)
+            if entry is None:
+                self.days[day] = [amount, 1]
+            else:
+                entry[0] += amount
+                entry[1] += 1
+            if timestamp > self.lastTimestamp:
+                self.lastTimestamp = timestamp
+
+# Append-only log of every sip, one JSON record per line, plus a per-day aggregate
+# index kept next to it. The index records how much of the log it covers and is
+# rebuilt from the log whenever the two disagree.
+class IntakeHistory:
+    def __init__(self, logPath=PATH_INTAKE_LOG, indexPath=PATH_INTAKE_INDEX):
+        self.logPath = logPath
+        self.indexPath = indexPath
+        # every copy sharing the log writes this index too
+        self.indexWriter = WriteBehindWriter(indexPath, fileLock=FileLock(indexPath + ".lock"))
+        self.days = {}        # "YYYY-MM-DD" -> [total ml, sips]
+        self.dayOrder = []    # sorted keys of self.days
+        self.logSize = 0
+        self.lastTimestamp = 0
+        self.baseStreak = 0   # streak carried over from before the log existed
+        self.streakMemo = None  # (today, goal, streak) of the last streak() answer
+        self.logFile = None
+        # other instances may append to the same log
+        self.fileLock = FileLock(logPath + ".lock")
+        self.listeners = []
+        # guards the index against the writer thread serializing it mid-update
+        self.lock = threading.Lock()
+        self.loadIndex()
+
+    def loadIndex(self):
+        try:
+            logSize = os.path.getsize(self.logPath)
+        except OSError:
+            logSize = 0
+
+        try:
+            with open(self.indexPath, "r") as fp:
+                index = json.load(fp)
+            if index.get("logSize") == logSize:
+                self.days = {day: list(entry) for day, entry in index["days"].items()}
+                self.dayOrder = sorted(self.days)
+                self.logSize = logSize
+                self.lastTimestamp = index.get("lastTimestamp", 0)
+                self.baseStreak = index.get("baseStreak", 0)
+                return
+        except (json.JSONDecodeError, OSError, KeyError, TypeError, ValueError, AttributeError):
+            pass
+        self.rebuildIndex()
+
+    def rebuildIndex(self):
+        with self.lock:
+            self.readLog()
+        self.saveIndex()
+
+    def readLog(self):
+        self.clearIndex()
+        self.logSize = 0
+        self.readTail()
+
+    def clearIndex(self):
+        self.days = {}
+        self.dayOrder = []
+        self.baseStreak = 0
+        self.streakMemo = None
+        self.lastTimestamp = 0
+
+    # folds in the records after logSize, up to the last complete line, and returns them
+    def readTail(self):
+        tail = self.parseTail(self.logSize, self.logSize)
+        self.applyTail(tail)
+        return tail.records
+
+    # reads without touching the index, so it can run on an I/O worker
+    def parseTail(self, base, start) -> LogTail:
+        records = []
+        carryOvers = []
+        end = start
+        try:
+            with open(self.logPath, "rb") as fp:
+                fp.seek(start)
+                for line in fp:
+                    if not line.endswith(b"\n"):
+                        # still being written by another instance
+                        break
+                    end += len(line)
+                    try:
+                        # decoding first spares json its encoding detection
+                        record = json.loads(line.decode("utf-8"))
+                        timestamp = record["t"]
+                        if isCarryOver(record):
+                            carryOvers.append(record)
+                            continue
+                        amount = record["ml"]
+                    except (ValueError, KeyError, TypeError):
+                        # skip a line cut short by a crash
+                        continue
+                    records.append((timestamp, amount))
+        except OSError:
+            pass
+        return LogTail(base, start, end, records, carryOvers)
+
+    # one step per day the tail touches, and at most one sort
+    def applyTail(self, tail):
+        for record in tail.carryOvers:
+            self.applyCarryOver(record)
+        days = self.days
+        added = False
+        for day, (amount, sips) in tail.days.items():
+            entry = days.get(day)
+            if entry is None:
+                days[day] = [amount, sips]
+                added = True
+            else:
+                entry[0] += amount
+                entry[1] += sips
+        if added:
+            self.dayOrder = sorted(days)
+        if self.streakMemo is not None and tail.days and min(tail.days) < self.streakMemo[0].isoformat():
+            self.streakMemo = None
+        self.lastTimestamp = max(self.lastTimestamp, tail.lastTimestamp)
+        self.logSize = tail.end
+
+    def logSizeOnDisk(self):
+        try:
+            return os.path.getsize(self.logPath)
+        except OSError:
+            return 0
+
+    # what other instances appended since logSize; one stat call when nothing changed.
+    # Runs on an I/O worker, so a big import elsewhere is parsed off the Tk thread.
+    def pollTail(self) -> LogTail:
+        base = self.logSize
+        size = self.logSizeOnDisk()
+        if size == base:
+            return LogTail(base, base)
+        # a shorter log was replaced; start over
+        return self.parseTail(base, base if size > base else 0)
+
+    # folds in a tail from pollTail, or polls here without one. A tail read before a
+    # sip was logged here is dropped; the next poll reads on from the new offset.
+    def refresh(self, tail=None) -> bool:
+        if tail is None:
+            tail = self.pollTail()
+        if tail.base != self.logSize or tail.start == tail.end == tail.base:
+            return False
+        with self.lock:
+            if tail.start < tail.base:
+                self.clearIndex()
+            self.applyTail(tail)
+        self.saveIndex()
+        if tail.start < tail.base:
+            return True
+        self.notify(tail.records)
+        return bool(tail.records)
+
+    # listeners get each batch of (timestamp, amount) in one call, so a bulk import
+    # or a long catch-up costs them one update rather than one per sip
+    def notify(self, records):
+        if not records:
+            return
+        for callback in list(self.listeners):
+            callback(records)
+
+    # the index is serialized on the writer thread, so appends stay O(1)
+    def saveIndex(self):
+        self.indexWriter.submit(self.serializeIndex)
+
+    # None leaves the file alone: a copy that appended past our offset saves an
+    # index covering more than ours, and an older snapshot landing last would undo it
+    def serializeIndex(self):
+        with self.lock:
+            if self.logSizeOnDisk() > self.logSize:
+                return None
+            return json.dumps({"logSize": self.logSize, "lastTimestamp": self.lastTimestamp,
+                               "baseStreak": self.baseStreak, "days": self.days})
+
+    def addToDay(self, day, amount, sips=1):
+        if self.streakMemo is not None and day < self.streakMemo[0].isoformat():
+            self.streakMemo = None
+        entry = self.days.get(day)
+        if entry is not None:
+            entry[0] += amount
+            entry[1] += sips
+            return
+        self.days[day] = [amount, sips]
+        if not self.dayOrder or day > self.dayOrder[-1]:
+            self.dayOrder.append(day)
+        else:
+            bisect.insort(self.dayOrder, day)
+
+    def writeRecord(self, record):
+        self.writeLines((json.dumps(record) + "\n").encode("utf-8"))
+
+    def writeLines(self, data):
+        if self.logFile is None:
+            self.logFile = open(self.logPath, "ab")
+        if os.fstat(self.logFile.fileno()).st_size > self.logSize:
+            # a line left unfinished by a crash; end it so these records stay readable
+            data = b"\n" + data
+        self.logFile.write(data)
+        self.logFile.flush()
+        self.logSize = self.logFile.tell()
+
+    # catches up with other instances first, so logSize stays a true offset
+    def append(self, timestamp: float, amount: int):
+        with self.fileLock, self.lock:
+            records = self.readTail() if self.logSizeOnDisk() != self.logSize else []
+            self.writeRecord({"t": timestamp, "ml": amount})
+            self.addToDay(dayKey(timestamp), amount)
+            self.lastTimestamp = max(self.lastTimestamp, timestamp)
+        records.append((timestamp, amount))
+        self.saveIndex()
+        self.notify(records)
+
+    # a batch of (timestamp, amount) in one locked write, for bulk imports
+    def appendMany(self, batch):
+        if not batch:
+            return
+        # same text as json.dumps for plain numbers, without its per-call overhead
+        data = "".join(f'{{"t": {timestamp!r}, "ml": {amount!r}}}\n' for timestamp, amount in batch)
+        with self.fileLock, self.lock:
+            records = self.readTail() if self.logSizeOnDisk() != self.logSize else []
+            self.writeLines(data.encode("utf-8"))
+            for timestamp, amount in batch:
+                self.addToDay(dayKey(timestamp), amount)
+            self.lastTimestamp = max(self.lastTimestamp, max(timestamp for timestamp, _ in batch))
+        records.extend(batch)
+        self.saveIndex()
+        self.notify(records)
+
+    def subscribe(self, callback):
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    # yields (timestamp, amount) for every readable record in the log
+    def iterRecords(self):
+        try:
+            with open(self.logPath, "r", encoding="utf-8", errors="replace") as fp:
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                        if not isCarryOver(record):
+                            yield record["t"], record["ml"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            return
+
+    # the time of every sip; lines as append writes them are not parsed any further
+    def iterTimestamps(self):
+        try:
+            with open(self.logPath, "rb") as fp:
+                for line in fp:
+                    comma = line.find(b",")
+                    if line.startswith(b'{"t": ') and line.startswith(b', "ml": ', comma):
+                        try:
+                            yield float(line[6:comma])
+                            continue
+                        except ValueError:
+                            pass
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                        timestamp = record["t"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if "ml" in record and not isCarryOver(record) and isinstance(timestamp, (int, float)) \
+                            and not isinstance(timestamp, bool):
+                        yield timestamp
+        except OSError:
+            return
+
+    # up to `limit` records from byte `offset` on, complete lines only, and the offset
+    # just past them; lets a reader ship the log in pieces and resume later
+    def readFrom(self, offset: int, limit: int):
+        records = []
+        try:
+            with open(self.logPath, "rb") as fp:
+                fp.seek(offset)
+                for line in fp:
+                    if not line.endswith(b"\n"):
+                        break
+                    offset += len(line)
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                        if isCarryOver(record):
+                            continue
+                        records.append((record["t"], record["ml"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if len(records) >= limit:
+                        break
+        except OSError:
+            pass
+        return records, offset
+
+    # seeds an empty history with the totals a pre-history config was tracking. The
+    # marker counts towards its day's total and the streak, but it is not a sip, so
+    # readers of the sips (export, sync, analytics' per-sip columns) never see it.
+    def importLegacy(self, timestamp: float, amount: int, streak: int):
+        record = {"t": timestamp, "carryOver": amount, "streak": streak}
+        with self.fileLock, self.lock:
+            self.writeRecord(record)
+            self.applyCarryOver(record)
+        self.saveIndex()
+
+    def applyCarryOver(self, record):
+        self.baseStreak = record["streak"]
+        self.streakMemo = None
+        # logs written before the marker had its own key kept the amount in "ml"
+        self.addToDay(dayKey(record["t"]), record.get("carryOver", record.get("ml", 0)), sips=0)
+
+    def isEmpty(self) -> bool:
+        return self.logSize == 0
+
+    def dayTotal(self, day) -> int:
+        entry = self.days.get(dayKey(day))
+        return entry[0] if entry is not None else 0
+
+    # daily totals for start..end inclusive, skipping days without sips
+    def totalsBetween(self, start, end):
+        lo = bisect.bisect_left(self.dayOrder, dayKey(start))
+        hi = bisect.bisect_right(self.dayOrder, dayKey(end))
+        return [(day, self.days[day][0]) for day in self.dayOrder[lo:hi]]
+
+    def lastDays(self, count: int, today=None):
+        today = today or date.today()
+        return self.totalsBetween(today - timedelta(days=count - 1), today)
+
+    # consecutive days before `today` that reached the goal; the answer for the
+    # day before is extended by one day instead of walking the whole streak again
+    def streak(self, today, goal: int) -> int:
+        if not self.dayOrder:
+            return self.baseStreak
+
+        memo = self.streakMemo
+        if memo is not None and memo[1] == goal:
+            if memo[0] == today:
+                return memo[2]
+            if memo[0] == today - timedelta(days=1):
+                streak = memo[2] + 1 if self.dayTotal(memo[0]) >= goal else 0
+                self.streakMemo = (today, goal, streak)
+                return streak
+        streak = self.countStreak(today, goal)
+        self.streakMemo = (today, goal, streak)
+        return streak
+
+    def countStreak(self, today, goal):
+
+        firstDay = self.dayOrder[0]
+        day = today - timedelta(days=1)
+        streak = 0
+        while True:
+            key = day.isoformat()
+            if key < firstDay:
+                return streak + self.baseStreak
+            if self.dayTotal(key) < goal:
+                return streak
+            streak += 1
+            day -= timedelta(days=1)
+
+    def flush(self):
+        self.indexWriter.flush()
+
+    def close(self):
+        if self.logFile is not None:
+            self.logFile.close()
+            self.logFile = None
+        self.indexWriter.close()
@@ -0,0 +1,290 @@
+import argparse
+import bisect
+import collections
+import contextlib
+import csv
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from configManager import ConfigManager
+from intakeHistory import dayKey
+
+BATCH_SIZE = 5000
+MAX_SIP_ML = 5000
+FUTURE_SLACK = 24 * 60 * 60   # s; clocks on other machines may run a little ahead
+MAX_REPORTED_ERRORS = 10
+DEDUP_MAX_KEYS = 100000       # timestamps held for duplicate checks at any one time
+TIMESTAMP_FIELDS = ("t", "timestamp", "time", "date")
+AMOUNT_FIELDS = ("ml", "amount", "volume")
+
+# Moves intake history between machines and other trackers, one record at a time:
+#   python intakeTransfer.py import sips.csv [--profile alice]
+#   python intakeTransfer.py export sips.ndjson
+# CSV files need a header with a time column (epoch seconds or ISO 8601, local time
+# when no offset is given) and an ml column; NDJSON lines hold {"t": ..., "ml": ...}.
+
+class RowError(ValueError):
+    pass
+
+def detectFormat(path, format):
+    if format:
+        return format
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+def field(row, names):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+def column(header, names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    raise RowError(f"no {names[0]} column in {', '.join(header)}")
+
+def parseTimestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise RowError(f"bad time {text!r}")
+
+def parseAmount(value):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"bad amount {value!r}")
+    return int(amount) if amount.is_integer() else amount
+
+def validate(timeValue, amountValue, now):
+    if timeValue is None or amountValue is None:
+        raise RowError("missing time or amount")
+    timestamp = parseTimestamp(timeValue)
+    amount = parseAmount(amountValue)
+    if not math.isfinite(timestamp) or timestamp <= 0 or timestamp > now + FUTURE_SLACK:
+        raise RowError(f"time {timestamp} out of range")
+    if not 0 < amount <= MAX_SIP_ML:
+        raise RowError(f"amount {amount} out of range")
+    return timestamp, amount
+
+# yields (line number, time, amount) without holding more than one row; both values
+# are None when the row could not be read
+def readRows(fp, format):
+    if format == "csv":
+        reader = csv.reader(fp)
+        header = [name.strip().lower() for name in next(reader, [])]
+        timeColumn = column(header, TIMESTAMP_FIELDS)
+        amountColumn = column(header, AMOUNT_FIELDS)
+        for row in reader:
+            if not row:
+                continue
+            try:
+                yield reader.line_num, row[timeColumn], row[amountColumn]
+            except IndexError:
+                yield reader.line_num, None, None
+        return
+    for lineNumber, line in enumerate(fp, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield lineNumber, None, None
+            continue
+        if not isinstance(row, dict):
+            yield lineNumber, None, None
+            continue
+        yield lineNumber, field(row, TIMESTAMP_FIELDS), field(row, AMOUNT_FIELDS)
+
+# sips are deduplicated on the millisecond, against the history and the file itself
+def timestampKey(timestamp):
+    return round(timestamp * 1000)
+
+# The timestamp keys of the sips on a window of days, so duplicate checks need no
+# more than maxKeys of them in memory however big the history or the file. Days the
+# history's index has no sips on start out empty without a look at the log; the
+# rest are read in one pass over the log per window, sized from the index's sip
+# counts. Files in time order read the log about once per window; rows out of
+# order cost a pass whenever their day has been dropped.
+class SeenTimestamps:
+    def __init__(self, history, maxKeys=DEDUP_MAX_KEYS):
+        self.history = history
+        self.maxKeys = maxKeys
+        self.days = collections.OrderedDict()   # day -> set of keys, least recently used first
+        self.keyCount = 0
+        self.logReads = 0
+
+    # loads every day in `days` and drops others past maxKeys
+    def prepare(self, days):
+        missing = []
+        for day in days:
+            if day in self.days:
+                self.days.move_to_end(day)
+            elif day in self.history.days:
+                missing.append(day)
+            else:
+                self.days[day] = set()
+        if missing:
+            # the least recently used days make room for the window
+            self.trim(days, self.maxKeys // 2)
+            self.readWindow(missing, self.maxKeys - self.keyCount)
+        self.trim(days, self.maxKeys)
+
+    def readWindow(self, missing, budget):
+        window = set(missing)
+        budget -= sum(self.history.days[day][1] for day in missing)
+        start = bisect.bisect_left(self.history.dayOrder, min(missing))
+        for day in self.history.dayOrder[start:]:
+            if day in self.days or day in window:
+                continue
+            budget -= self.history.days[day][1]
+            if budget < 0:
+                break
+            window.add(day)
+        loaded = {day: set() for day in window}
+        # only records near the window need a day key; a day of margin either side
+        first = datetime.fromisoformat(min(window)).timestamp() - 86400
+        last = (datetime.fromisoformat(max(window)) + timedelta(days=2)).timestamp()
+        for timestamp in self.history.iterTimestamps():
+            if not first <= timestamp < last:
+                continue
+            try:
+                keys = loaded.get(dayKey(timestamp))
+            except (OverflowError, OSError, ValueError):
+                continue
+            if keys is not None:
+                keys.add(timestampKey(timestamp))
+        self.logReads += 1
+        for day in sorted(loaded):
+            self.days[day] = loaded[day]
+            self.keyCount += len(loaded[day])
+        for day in missing:
+            self.days.move_to_end(day)
+
+    def trim(self, keep, limit):
+        for day in list(self.days):
+            if self.keyCount <= limit:
+                return
+            if day not in keep:
+                self.keyCount -= len(self.days.pop(day))
+
+    # True the first time a timestamp is seen; its day must have been prepared
+    def add(self, timestamp) -> bool:
+        keys = self.days[dayKey(timestamp)]
+        key = timestampKey(timestamp)
+        if key in keys:
+            return False
+        keys.add(key)
+        self.keyCount += 1
+        return True
+
+def importFile(config, fp, format):
+    history = config.history
+    seen = SeenTimestamps(history)
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+    errors = []
+    chunk = []
+    now = time.time()
+
+    def writeChunk():
+        seen.prepare({dayKey(timestamp) for timestamp, _ in chunk})
+        batch = [(timestamp, amount) for timestamp, amount in chunk if seen.add(timestamp)]
+        stats["duplicates"] += len(chunk) - len(batch)
+        history.appendMany(batch)
+        stats["imported"] += len(batch)
+        chunk.clear()
+
+    for lineNumber, timeValue, amountValue in readRows(fp, format):
+        stats["read"] += 1
+        try:
+            chunk.append(validate(timeValue, amountValue, now))
+        except RowError as e:
+            stats["invalid"] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"line {lineNumber}: {e}")
+            continue
+        if len(chunk) >= BATCH_SIZE:
+            writeChunk()
+    writeChunk()
+
+    # today's total and the streak are derived once, not per row
+    if stats["imported"]:
+        config.data["lastIntakeTime"] = max(config.lastIntakeTime, history.lastTimestamp)
+        config.resetOnNewDay()
+        config.save()
+    return stats, errors
+
+# only well-formed records; anything else in the log would not import again anyway
+def exportRecords(history):
+    for timestamp, amount in history.iterRecords():
+        if isinstance(timestamp, (int, float)) and isinstance(amount, (int, float)):
+            yield timestamp, amount
+
+def exportFile(config, fp, format):
+    count = 0
+    if format == "csv":
+        writer = csv.writer(fp, lineterminator="\n")
+        writer.writerow(["timestamp", "time", "ml"])
+        for timestamp, amount in exportRecords(config.history):
+            writer.writerow([timestamp, datetime.fromtimestamp(timestamp).isoformat(timespec="seconds"), amount])
+            count += 1
+    else:
+        for timestamp, amount in exportRecords(config.history):
+            fp.write(f'{{"t": {timestamp!r}, "ml": {amount!r}}}\n')
+            count += 1
+    return count
+
+def openText(path, mode):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    return open(path, mode, encoding="utf-8", newline="")
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export intake history as CSV or NDJSON")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="file to read or write; - for stdin/stdout")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--profile", help="the pet profile whose history to use")
+    args = parser.parse_args()
+    format = detectFormat(args.path, args.format)
+
+    config = ConfigManager(args.profile)
+    start = time.perf_counter()
+    try:
+        if args.command == "import":
+            if args.path != "-" and not os.path.exists(args.path):
+                print(f"no such file: {args.path}", file=sys.stderr)
+                return 1
+            try:
+                with openText(args.path, "r") as fp:
+                    stats, errors = importFile(config, fp, format)
+            except RowError as e:
+                print(f"{args.path}: {e}", file=sys.stderr)
+                return 1
+            elapsed = time.perf_counter() - start
+            print(f"read {stats['read']} rows in {elapsed:.2f} s: {stats['imported']} imported, "
+                  f"{stats['duplicates']} duplicates, {stats['invalid']} invalid", file=sys.stderr)
+            for error in errors:
+                print(f"  {error}", file=sys.stderr)
+            print(f"today {config.currentIntake} ml, streak {config.streak} days", file=sys.stderr)
+        else:
+            with openText(args.path, "w") as fp:
+                count = exportFile(config, fp, format)
+            print(f"exported {count} records in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    finally:
+        config.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import queue
+import threading
+
+IO_WORKERS = 2
+POLL_MS = 10          # first look for results after a prompt submit
+POLL_MAX_MS = 250     # backed off to while a slow read is still out
+DRAIN_BATCH = 4       # results handed over per idle slot
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+
+class IoFuture:
+    def __init__(self, func, args, onDone, onError, prompt):
+        self.func = func
+        self.args = args
+        self.onDone = onDone
+        self.onError = onError
+        self.prompt = prompt
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    # a cancelled future never calls back; work already running finishes unseen
+    def cancel(self) -> bool:
+        with self.lock:
+            if self.state in (DONE, CANCELLED):
+                return False
+            self.state = CANCELLED
+            return True
+
+    def cancelled(self) -> bool:
+        return self.state == CANCELLED
+
+    def done(self) -> bool:
+        return self.state in (DONE, CANCELLED)
+
+    def begin(self) -> bool:
+        with self.lock:
+            if self.state != PENDING:
+                return False
+            self.state = RUNNING
+            return True
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception as e:
+            self.error = e
+
+    # on the Tk thread
+    def finish(self):
+        with self.lock:
+            if self.state != RUNNING:
+                return
+            self.state = DONE
+        if self.error is not None:
+            if self.onError is not None:
+                self.onError(self.error)
+            else:
+                print(f"Background task failed: {self.error}")
+        elif self.onDone is not None:
+            self.onDone(self.result)
+
+# Runs blocking file work (reads, writes, raw asset bytes) on a few worker threads so
+# the pet keeps animating and dragging while the disk is slow. Workers never touch Tk:
+# finished futures go on a queue that the Tk thread drains in after_idle slots.
+# Prompt futures, e.g. images a window is waiting for, are polled for until they are
+# back; the rest wait for the next pump(), which the pets' ticks call anyway, so
+# periodic background work costs no wakeups of its own.
+class IoPool:
+    def __init__(self, window, scheduler, workers=IO_WORKERS):
+        self.window = window
+        self.scheduler = scheduler
+        self.workerCount = workers
+        self.threads = []
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.inFlight = 0
+        self.promptInFlight = 0
+        self.pollTimer = None
+        self.pollDelay = POLL_MS
+        self.drainPending = False
+        self.completed = 0
+
+    def submit(self, func, *args, onDone=None, onError=None, prompt=True) -> IoFuture:
+        future = IoFuture(func, args, onDone, onError, prompt)
+        if not self.threads:
+            for i in range(self.workerCount):
+                thread = threading.Thread(target=self.work, name=f"io-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        self.inFlight += 1
+        self.tasks.put(future)
+        if prompt:
+            self.promptInFlight += 1
+            self.pollDelay = POLL_MS
+            if self.pollTimer is None:
+                self.pollTimer = self.scheduler.schedule(self.pollDelay, self.poll)
+        return future
+
+    def cancel(self, future):
+        if future is not None:
+            future.cancel()
+
+    def work(self):
+        while True:
+            future = self.tasks.get()
+            if future is None:
+                return
+            if future.begin():
+                future.run()
+            # cancelled ones come back too, so inFlight stays right
+            self.results.put(future)
+
+    # hands over whatever has finished; cheap enough to call on every tick
+    def pump(self):
+        if not self.drainPending and not self.results.empty():
+            self.drainPending = True
+            self.window.after_idle(self.drain)
+
+    def poll(self):
+        self.pollTimer = None
+        if self.results.empty():
+            self.pollDelay = min(self.pollDelay * 2, POLL_MAX_MS)
+        else:
+            self.pollDelay = POLL_MS
+            self.pump()
+        if self.promptInFlight > 0:
+            self.pollTimer = self.scheduler.schedule(self.pollDelay, self.poll)
+
+    def drain(self):
+        self.drainPending = False
+        for _ in range(DRAIN_BATCH):
+            try:
+                future = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.inFlight -= 1
+            if future.prompt:
+                self.promptInFlight -= 1
+            self.completed += 1
+            future.finish()
+        if not self.results.empty():
+            self.drainPending = True
+            self.window.after_idle(self.drain)
+
+    def getStats(self):
+        return {"inFlight": self.inFlight, "completed": self.completed, "queued": self.tasks.qsize()}
+
+    def close(self):
+        self.scheduler.cancel(self.pollTimer)
+        self.pollTimer = None
+        for _ in self.threads:
+            self.tasks.put(None)
+        self.threads = []
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+
+PATH_METRICS = "metrics.ndjson"
+METRICS_INTERVAL = 60                # s between exported records
+METRICS_MAX_BYTES = 1024 * 1024      # rotate the file past this size
+METRICS_BACKUPS = 3
+BUCKET_COUNT = 32                    # power-of-two microsecond buckets, up to ~35 min
+
+def roundMs(value):
+    return None if value is None else round(value, 3)
+
+# Fixed-size histogram over power-of-two microsecond buckets. Recording is a
+# bit_length and a list increment, so it is cheap enough for every tick.
+class Histogram:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def record(self, ms):
+        self.buckets[min(int(ms * 1000).bit_length(), BUCKET_COUNT - 1)] += 1
+        self.count += 1
+        self.total += ms
+        if self.minimum is None or ms < self.minimum:
+            self.minimum = ms
+        if self.maximum is None or ms > self.maximum:
+            self.maximum = ms
+
+    # upper edge of the bucket holding the given fraction of samples, in ms
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucketCount in enumerate(self.buckets):
+            seen += bucketCount
+            if seen >= target:
+                return min((1 << index) / 1000, self.maximum)
+        return self.maximum
+
+    def toDict(self, seconds=None):
+        result = {
+            "count": self.count,
+            "mean_ms": roundMs(self.total / self.count if self.count else None),
+            "min_ms": roundMs(self.minimum),
+            "p50_ms": roundMs(self.percentile(0.50)),
+            "p95_ms": roundMs(self.percentile(0.95)),
+            "p99_ms": roundMs(self.percentile(0.99)),
+            "max_ms": roundMs(self.maximum),
+        }
+        if seconds:
+            result["rate_per_s"] = round(self.count / seconds, 2)
+        return result
+
+# Appends lines to a file and shifts it to .1, .2, ... once it grows past maxBytes.
+class RotatingFile:
+    def __init__(self, path=PATH_METRICS, maxBytes=METRICS_MAX_BYTES, backups=METRICS_BACKUPS):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.backups = backups
+
+    def rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def append(self, line):
+        data = (line + "\n").encode("utf-8")
+        try:
+            if os.path.getsize(self.path) + len(data) > self.maxBytes:
+                self.rotate()
+        except OSError:
+            pass
+        with open(self.path, "ab") as fp:
+            fp.write(data)
+
+# Optional instrumentation. While disabled nothing is wrapped and call sites only
+# check the enabled flag on cold paths, so the pet runs exactly as without it.
+# Startup marks are always taken; they are a handful of clock reads.
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.gauges = {}
+        self.marks = []
+        self.startupReported = False
+        self.output = None
+        self.intervalStart = time.perf_counter()
+
+    def enable(self, path=PATH_METRICS, maxBytes=METRICS_MAX_BYTES, backups=METRICS_BACKUPS):
+        self.enabled = True
+        self.output = RotatingFile(path, maxBytes, backups)
+        self.intervalStart = time.perf_counter()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def observe(self, name, ms):
+        self.histogram(name).record(ms)
+
+    # runs func once and records how long it took
+    def measure(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.histogram(name).record((time.perf_counter() - start) * 1000)
+
+    # wraps func so every call is timed; install it in place of the original
+    def timed(self, name, func):
+        histogram = self.histogram(name)
+        clock = time.perf_counter
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record((clock() - start) * 1000)
+        return wrapper
+
+    def addGauge(self, name, func):
+        self.gauges[name] = func
+
+    def beginStartup(self):
+        self.marks = [("start", time.perf_counter())]
+        self.startupReported = False
+
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter()))
+
+    # ms from the start of startup to the first mark of that phase, or None
+    def sinceStart(self, phase):
+        for name, moment in self.marks:
+            if name == phase:
+                return round((moment - self.marks[0][1]) * 1000, 3)
+        return None
+
+    # ms from the previous mark to the end of each phase
+    def startupPhases(self):
+        if not self.marks:
+            return {}
+        origin = self.marks[0][1]
+        phases = {}
+        previous = origin
+        for phase, moment in self.marks[1:]:
+            phases[phase] = round((moment - previous) * 1000, 3)
+            previous = moment
+        phases["total"] = round((previous - origin) * 1000, 3)
+        return phases
+
+    def snapshot(self):
+        seconds = time.perf_counter() - self.intervalStart
+        record = {
+            "ts": round(time.time(), 3),
+            "interval_s": round(seconds, 3),
+            "histograms": {name: histogram.toDict(seconds)
+                           for name, histogram in sorted(self.histograms.items()) if histogram.count},
+            "gauges": {name: gauge() for name, gauge in sorted(self.gauges.items())},
+        }
+        if not self.startupReported:
+            record["startup_ms"] = self.startupPhases()
+            record["first_frame_ms"] = self.sinceStart("firstFrame")
+            record["first_map_ms"] = self.sinceStart("mapped")
+        return record
+
+    # writes one record for the interval so far and starts a new interval
+    def export(self):
+        if not self.enabled:
+            return None
+        record = self.snapshot()
+        try:
+            self.output.append(json.dumps(record, sort_keys=True))
+        except OSError:
+            return None
+        self.startupReported = True
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.intervalStart = time.perf_counter()
+        return record
+
+metrics = Metrics()
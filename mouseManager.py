@@ -1,6 +1,4 @@
-STATE_IDLE = 0
-STATE_PANIC = 1
-STATE_HOVER = 2
+DRAG_FRAME_DELAY = 16   # one display frame at 60 Hz
 
 #Handles mouse interactions for pet dragging and clicking.
 class MouseHandler:
@@ -10,8 +8,15 @@ class MouseHandler:
         self.dragStartY = 0
         self.clickStartPos = (0, 0)
         self.potentialDrag = False
+        # latest pointer position not yet applied to the window
+        self.pendingDrag = None
+        self.dragTimer = None
+        self.lastDragApply = None
+        self.appliedMoves = 0
+        self.droppedMoves = 0
 
     def pressLeft(self, event):
+        self.pet.noteInput()
         self.clickStartPos = (event.x_root, event.y_root)
         self.potentialDrag = True
 
@@ -33,30 +38,65 @@ class MouseHandler:
         self.potentialDrag = False
 
     def startDrag(self, event):
-        self.pet.behaviour.setBehaviour(STATE_PANIC)
-        self.dragStartX = event.x
-        self.dragStartY = event.y
+        self.pet.behaviour.trigger("dragStart")
+        # relative to the pet, not the window, which may also hold overlays
+        self.dragStartX = event.x - self.pet.renderer.originX
+        self.dragStartY = event.y - self.pet.renderer.originY
 
     def dragPet(self, event):
         if self.pet.behaviour.isDragging():
-            newX = self.pet.window.winfo_pointerx() - self.dragStartX
-            newY = self.pet.window.winfo_pointery() - self.dragStartY
+            if self.pendingDrag is not None:
+                self.droppedMoves += 1
+            self.pendingDrag = (event.x_root, event.y_root)
 
-            self.pet.x = newX
-            self.pet.y = newY
+            if self.dragTimer is None:
+                # apply at most one move per display frame
+                elapsed = DRAG_FRAME_DELAY
+                if self.lastDragApply is not None:
+                    elapsed = self.pet.scheduler.now() - self.lastDragApply
+                if elapsed >= DRAG_FRAME_DELAY:
+                    self.applyDrag()
+                else:
+                    self.dragTimer = self.pet.scheduler.schedule(DRAG_FRAME_DELAY - elapsed, self.applyDrag)
 
-            self.pet.window.geometry(f'{self.pet.petWidth}x{self.pet.petHeight}+{newX}+{newY}')
+    def applyDrag(self):
+        self.dragTimer = None
+        if self.pendingDrag is None:
+            return
+
+        pointerX, pointerY = self.pendingDrag
+        self.pendingDrag = None
+        self.lastDragApply = self.pet.scheduler.now()
+        self.appliedMoves += 1
+
+        newX = pointerX - self.dragStartX
+        newY = pointerY - self.dragStartY
+
+        self.pet.x = newX
+        self.pet.y = newY
+
+        if self.pet.renderer.moveTo(newX, newY, self.pet.petWidth, self.pet.petHeight):
+            self.pet.publishPosition()
 
     def endDrag(self, event):
-        self.pet.behaviour.setBehaviour(STATE_IDLE)
+        # land exactly where the pointer was released
+        self.pet.scheduler.cancel(self.dragTimer)
+        self.applyDrag()
+        self.lastDragApply = None
+        self.pet.behaviour.trigger("dragEnd")
 
+    # the state machine keeps a drag from being interrupted by hover events
     def startHover(self, event):
-        if not self.pet.behaviour.isDragging():
-            self.pet.behaviour.setBehaviour(STATE_HOVER)
+        self.pet.noteInput()
+        self.pet.behaviour.trigger("hoverStart")
 
     def endHover(self, event):
-        if not self.pet.behaviour.isDragging():
-            self.pet.behaviour.setBehaviour(STATE_IDLE)
+        self.pet.noteInput()
+        self.pet.behaviour.trigger("hoverEnd")
 
     def openSetup(self, event):
-        self.pet.openSetupWindow()
\ No newline at end of file
+        self.pet.noteInput()
+        self.pet.openSetupWindow()
+
+    def getDragStats(self):
+        return {"appliedMoves": self.appliedMoves, "droppedMoves": self.droppedMoves}
\ No newline at end of file
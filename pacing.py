@@ -0,0 +1,74 @@
+PACE_ACTIVE = "active"   # hovered, dragged or reminding: full rate
+PACE_NORMAL = "normal"   # recent input: the animation's own rate
+PACE_IDLE = "idle"       # no input for a while: slowed down
+PACE_ASLEEP = "asleep"   # long idle or not visible: no frames, only a slow probe
+
+# Thresholds for the adaptive animation loop. All times are in ms.
+class PacingPolicy:
+    def __init__(self, enabled=True, idleAfterMs=60000, sleepAfterMs=300000, idleFrameMs=1000,
+                 probeMs=5000, activeStates=("hover", "panic", "thirsty")):
+        self.enabled = enabled
+        self.idleAfterMs = idleAfterMs
+        self.sleepAfterMs = sleepAfterMs
+        self.idleFrameMs = idleFrameMs
+        self.probeMs = probeMs
+        self.activeStates = set(activeStates)
+
+    def frameDelay(self, mode, animationDelay):
+        if mode == PACE_ASLEEP:
+            return self.probeMs
+        if mode == PACE_IDLE:
+            return max(animationDelay, self.idleFrameMs)
+        return animationDelay
+
+# Decides how fast the pet animates from the time since the last input, whether the
+# window can be seen and the current behaviour. Pointer movement anywhere on screen
+# counts as input, sampled only while already idle so the full-rate path stays free.
+class Pacer:
+    def __init__(self, policy, clock):
+        self.policy = policy
+        self.clock = clock
+        self.lastInput = clock()
+        self.lastPointer = None
+        self.visible = True
+        self.mode = PACE_NORMAL
+        self.ticks = {PACE_ACTIVE: 0, PACE_NORMAL: 0, PACE_IDLE: 0, PACE_ASLEEP: 0}
+
+    def noteInput(self):
+        self.lastInput = self.clock()
+
+    def setVisible(self, visible):
+        self.visible = visible
+
+    def isResting(self):
+        return self.mode in (PACE_IDLE, PACE_ASLEEP)
+
+    def samplePointer(self, window):
+        pointer = window.winfo_pointerxy()
+        if self.lastPointer is not None and pointer != self.lastPointer:
+            self.noteInput()
+        self.lastPointer = pointer
+
+    def update(self, state, window):
+        policy = self.policy
+        if not policy.enabled:
+            self.mode = PACE_NORMAL
+        elif state in policy.activeStates:
+            self.mode = PACE_ACTIVE
+        else:
+            if self.isResting():
+                self.samplePointer(window)
+            else:
+                self.lastPointer = None
+            idleFor = self.clock() - self.lastInput
+            if not self.visible or idleFor >= policy.sleepAfterMs:
+                self.mode = PACE_ASLEEP
+            elif idleFor >= policy.idleAfterMs:
+                self.mode = PACE_IDLE
+            else:
+                self.mode = PACE_NORMAL
+        self.ticks[self.mode] += 1
+        return self.mode
+
+    def getStats(self):
+        return {"mode": self.mode, "visible": self.visible, "ticks": dict(self.ticks)}
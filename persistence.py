@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+FLUSH_DELAY = 0.5   # seconds to gather further changes before writing
+
+# Writes JSON documents off the UI thread. Every submit replaces the pending snapshot,
+# so a burst of changes turns into a single write once the flush delay has passed.
+# A callable may be submitted instead of data; it is asked for the JSON text at write time,
+# inside fileLock when one is given, so it can merge with what is on disk.
+class WriteBehindWriter:
+    def __init__(self, path, flushDelay=FLUSH_DELAY, fileLock=None):
+        self.path = path
+        self.flushDelay = flushDelay
+        self.fileLock = fileLock
+        self.pending = None
+        self.closed = False
+        self.thread = None
+        self.condition = threading.Condition()
+        # held while a snapshot is taken and written, so writes land in order
+        self.writeLock = threading.Lock()
+        self.submits = 0
+        self.writes = 0
+
+    def submit(self, data):
+        snapshot = data if callable(data) else json.dumps(data)
+        closed = False
+        with self.condition:
+            self.pending = snapshot
+            self.submits += 1
+            if self.closed:
+                closed = True
+            elif self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        if closed:
+            self.writePending()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                deadline = time.monotonic() + self.flushDelay
+                while not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            self.writePending()
+
+    def writePending(self):
+        with self.writeLock:
+            with self.condition:
+                snapshot = self.pending
+                self.pending = None
+            if snapshot is None:
+                return
+            with self.fileLock or nullcontext():
+                if callable(snapshot):
+                    snapshot = snapshot()
+                if snapshot is not None:
+                    writeAtomic(self.path, snapshot)
+                    self.writes += 1
+
+    def flush(self):
+        self.writePending()
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+# Writes to a temp file next to the target and renames it over the original, so a
+# crash leaves either the old or the new file, never a truncated one.
+def writeAtomic(path, text):
+    tmpPath = path + ".tmp"
+    try:
+        with open(tmpPath, "w") as fp:
+            fp.write(text)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmpPath, path)
+        return True
+    except OSError:
+        return False
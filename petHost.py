@@ -0,0 +1,109 @@
+import argparse
+import sys
+import tkinter as tk
+from desktopPet import DesktopPet, FRAME_HEIGHT, FRAME_WIDTH
+from metrics import METRICS_INTERVAL, metrics
+from scheduler import Scheduler
+from ioPool import IoPool
+
+BATCH_WINDOW = 25   # ms; pets due this close together are drawn in the same wakeup
+PET_GAP = 16        # px between neighbouring pets
+
+# Hosts several pets as Toplevels under one hidden Tk root. They share the root's
+# scheduler, the compiled animation frames and a single animation timer: every
+# wakeup steps all pets that are due, and pets stepped together stay in phase,
+# so wakeups barely grow with the number of pets.
+class PetHost:
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.scheduler = Scheduler(self.root, clock = clock.monotonicMs if clock else None)
+        # one set of I/O workers for every pet
+        self.io = IoPool(self.root, self.scheduler)
+        self.pets = []
+        self.deadlines = {}
+        self.timer = None
+        self.ticks = 0
+
+    def addPet(self, profile=None):
+        if self.pets:
+            last = self.pets[-1]
+            x, y = last.x + last.petWidth + PET_GAP, last.y
+        else:
+            x, y = FRAME_WIDTH, FRAME_HEIGHT
+        pet = DesktopPet(host=self, profile=profile, x=x, y=y, clock=self.clock)
+        self.pets.append(pet)
+        return pet
+
+    # called by a pet when its animation starts
+    def attach(self, pet):
+        self.deadlines[pet] = self.scheduler.now()
+        self.arm()
+
+    def detach(self, pet):
+        self.deadlines.pop(pet, None)
+        self.arm()
+
+    def wake(self, pet):
+        if pet in self.deadlines:
+            self.deadlines[pet] = self.scheduler.now()
+            self.arm()
+
+    def arm(self):
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+        if self.deadlines:
+            delay = min(self.deadlines.values()) - self.scheduler.now()
+            self.timer = self.scheduler.schedule(max(0, delay), self.tick)
+
+    def tick(self):
+        self.timer = None
+        self.ticks += 1
+        now = self.scheduler.now()
+        limit = now + BATCH_WINDOW
+        for pet, deadline in list(self.deadlines.items()):
+            if deadline <= limit:
+                self.deadlines[pet] = now + pet.step()
+        self.arm()
+
+    def exportMetrics(self):
+        metrics.export()
+        self.scheduler.schedule(METRICS_INTERVAL * 1000, self.exportMetrics)
+
+    def getStats(self):
+        return {"pets": len(self.pets), "ticks": self.ticks, "scheduler": self.scheduler.getStats()}
+
+    def close(self):
+        self.deadlines.clear()
+        self.arm()
+        for pet in self.pets:
+            pet.close()
+        self.io.close()
+        self.root.destroy()
+
+    def run(self):
+        for pet in self.pets:
+            pet.start()
+        if metrics.enabled:
+            self.scheduler.schedule(METRICS_INTERVAL * 1000, self.exportMetrics)
+        try:
+            self.root.mainloop()
+        finally:
+            metrics.export()
+            self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several pets on one desktop")
+    parser.add_argument("profiles", nargs="+", metavar="profile",
+                        help="one pet per profile, each with its own config-<profile>.json and intake log")
+    args = parser.parse_args()
+
+    host = PetHost()
+    for profile in args.profiles:
+        host.addPet(profile)
+    host.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
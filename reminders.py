@@ -0,0 +1,195 @@
+import math
+import time
+from datetime import datetime, timedelta
+
+REMINDER_SLACK = 1.0   # s, how early a timer may fire and still count as due
+
+DEFAULT_REMINDER_RULES = [
+    {"type": "interval", "minutes": 60},
+]
+
+def clockMinute(text):
+    if not isinstance(text, str):
+        raise ValueError(f"time of day must be \"HH:MM\", not {text!r}")
+    hours, minutes = (int(part) for part in text.split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"no such time of day: {text}")
+    return hours * 60 + minutes
+
+# a zero or negative length would re-arm the reminder timer at 0 ms forever
+def positiveMinutes(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        raise ValueError(f"{name} must be a number of minutes above 0, not {value!r}")
+    return value
+
+def minuteOfDay(timestamp):
+    moment = datetime.fromtimestamp(timestamp)
+    return moment.hour * 60 + moment.minute
+
+# timestamp of the given minute on the local day of timestamp, dayOffset days later
+def atMinute(timestamp, minute, dayOffset=0):
+    midnight = datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight + timedelta(days=dayOffset, minutes=minute)).timestamp()
+
+# Rules either propose a due time (due) or push a proposed time out of a window
+# where reminders are not wanted (defer). All times are epoch seconds.
+class ReminderRule:
+    def due(self, now, engine):
+        return None
+
+    def defer(self, timestamp):
+        return timestamp
+
+# remind a fixed time after the last sip or the last reminder, whichever is later
+class IntervalRule(ReminderRule):
+    def __init__(self, minutes=60):
+        self.interval = positiveMinutes(minutes, "minutes") * 60
+
+    def due(self, now, engine):
+        return max(engine.config.lastIntakeTime or 0, engine.lastReminder) + self.interval
+
+# remind as soon as the day's intake falls a sip behind an even pace towards the goal
+class PaceRule(ReminderRule):
+    def __init__(self, start="08:00", end="22:00", snoozeMinutes=15):
+        self.start = clockMinute(start)
+        self.end = clockMinute(end)
+        self.snooze = positiveMinutes(snoozeMinutes, "snoozeMinutes") * 60
+
+    def due(self, now, engine):
+        goal = engine.config.dailyGoal
+        sip = engine.config.sipAmount
+        if goal <= 0:
+            return None
+        dayStart = atMinute(now, self.start)
+        dayEnd = atMinute(now, self.end)
+        drunk = engine.config.history.dayTotal(now)
+
+        if drunk >= goal or now >= dayEnd:
+            # nothing more today; the first sip of tomorrow's pace
+            tomorrow = atMinute(now, self.start, 1)
+            return tomorrow + min(sip / goal, 1) * (atMinute(now, self.end, 1) - tomorrow)
+        behind = min(dayStart + (drunk + sip) / goal * (dayEnd - dayStart), dayEnd)
+        return max(behind, engine.lastReminder + self.snooze)
+
+# no reminders between start and end; the window may wrap past midnight
+class QuietHoursRule(ReminderRule):
+    def __init__(self, start="22:00", end="08:00"):
+        self.start = clockMinute(start)
+        self.end = clockMinute(end)
+
+    def defer(self, timestamp):
+        minute = minuteOfDay(timestamp)
+        if self.start <= self.end:
+            if self.start <= minute < self.end:
+                return atMinute(timestamp, self.end)
+        elif minute >= self.start:
+            return atMinute(timestamp, self.end, 1)
+        elif minute < self.end:
+            return atMinute(timestamp, self.end)
+        return timestamp
+
+RULE_TYPES = {
+    "interval": IntervalRule,
+    "pace": PaceRule,
+    "quietHours": QuietHoursRule,
+}
+
+def makeRule(spec):
+    try:
+        options = dict(spec)
+    except (TypeError, ValueError):
+        raise ValueError(f"reminder rule is not an object: {spec!r}")
+    ruleType = options.pop("type", None)
+    if ruleType not in RULE_TYPES:
+        raise ValueError(f"unknown reminder rule type: {ruleType}")
+    try:
+        return RULE_TYPES[ruleType](**options)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid '{ruleType}' reminder rule: {e}")
+
+# a typo in config.json must not keep the pet from starting: bad rules are skipped,
+# and the defaults apply when nothing usable is left
+def makeRules(specs):
+    if not isinstance(specs, list):
+        print("reminderRules must be a list, using the defaults")
+        specs = DEFAULT_REMINDER_RULES
+    rules = []
+    for spec in specs:
+        try:
+            rules.append(makeRule(spec))
+        except ValueError as e:
+            print(f"Skipping reminder rule: {e}")
+    if specs and not rules:
+        rules = [makeRule(spec) for spec in DEFAULT_REMINDER_RULES]
+    return rules
+
+# Works out the exact time of the next reminder from the rules and keeps a single
+# scheduler timer for it. A logged sip moves the deadline straight away, so nothing
+# ever polls the clock.
+class ReminderEngine:
+    def __init__(self, scheduler, config, onDue, rules=None, clock=time.time):
+        self.scheduler = scheduler
+        self.config = config
+        self.onDue = onDue
+        self.clock = clock
+        self.rules = makeRules(rules if rules is not None else DEFAULT_REMINDER_RULES)
+        self.lastReminder = 0
+        self.deadline = None
+        self.timer = None
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        # like before, the first reminder counts from startup
+        self.lastReminder = self.clock()
+        self.config.history.subscribe(self.onSip)
+        self.reschedule()
+
+    def stop(self):
+        self.running = False
+        self.config.history.unsubscribe(self.onSip)
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+        self.deadline = None
+
+    def nextDue(self, now=None):
+        now = self.clock() if now is None else now
+        proposals = [due for due in (rule.due(now, self) for rule in self.rules) if due is not None]
+        if not proposals:
+            return None
+        due = max(min(proposals), now)
+
+        # a deferral can land inside another rule's window, so settle them together
+        for _ in range(len(self.rules) + 1):
+            deferred = due
+            for rule in self.rules:
+                deferred = rule.defer(deferred)
+            if deferred == due:
+                break
+            due = deferred
+        return due
+
+    def reschedule(self):
+        self.scheduler.cancel(self.timer)
+        self.timer = None
+        if not self.running:
+            return
+        now = self.clock()
+        self.deadline = self.nextDue(now)
+        if self.deadline is not None:
+            self.timer = self.scheduler.schedule((self.deadline - now) * 1000, self.fire)
+
+    def fire(self):
+        self.timer = None
+        now = self.clock()
+        due = self.nextDue(now)
+        # the wall clock may have moved since the timer was set
+        if due is not None and due <= now + REMINDER_SLACK:
+            self.lastReminder = now
+            self.onDue()
+        self.reschedule()
+
+    def onSip(self, records):
+        self.reschedule()
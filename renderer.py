@@ -0,0 +1,225 @@
+import tkinter as tk
+
+RENDERER_LABEL = "label"
+RENDERER_CANVAS = "canvas"
+BUBBLE_WIDTH = 200
+BUBBLE_HEIGHT = 100
+BUBBLE_OVERLAP = 50       # px of the bubble that sit over the pet's head
+RING_SIZE = 22
+RING_MARGIN = 3
+RING_WIDTH = 3
+RING_COLOUR = "#4fc3f7"
+RING_TRACK_COLOUR = "#3a3a3a"
+
+def makeRenderer(kind, window):
+    if kind == RENDERER_CANVAS:
+        return CanvasRenderer(window)
+    return LabelRenderer(window)
+
+# Draws the pet into its window, only touching Tk when the frame or position
+# actually changed since the last render.
+class LabelRenderer:
+    # the window's top-left is the pet's; overlays live in their own windows
+    hasOverlays = False
+
+    def __init__(self, window, label=None):
+        self.window = window
+        if label is None:
+            label = tk.Label(window, bd = 0, bg = 'black')
+            label.pack()
+        self.label = label
+        self.widget = label
+        self.originX = 0
+        self.originY = 0
+        self.lastFrame = None
+        self.lastGeometry = None
+        self.tkCalls = 0
+        self.skippedCalls = 0
+
+    # returns True when the window was moved
+    def render(self, frame, x, y, width, height, updatePosition=True):
+        moved = updatePosition and self.moveTo(x, y, width, height)
+        self.showFrame(frame)
+        return moved
+
+    def registerFrames(self, frames):
+        pass
+
+    def showFrame(self, frame):
+        if frame is self.lastFrame:
+            self.skippedCalls += 1
+            return False
+        self.label.configure(image = frame)
+        self.lastFrame = frame
+        self.tkCalls += 1
+        return True
+
+    def moveTo(self, x, y, width, height):
+        geometry = (width, height, x, y)
+        if geometry == self.lastGeometry:
+            self.skippedCalls += 1
+            return False
+        self.window.geometry(f'{width}x{height}+{x}+{y}')
+        self.lastGeometry = geometry
+        self.tkCalls += 1
+        return True
+
+    def setProgress(self, fraction):
+        pass
+
+    def getStats(self):
+        return {"tkCalls": self.tkCalls, "skippedCalls": self.skippedCalls}
+
+# Draws the pet on a single canvas. Every frame becomes a hidden image item the first
+# time it is seen, so a frame change only swaps two items' state instead of
+# re-laying out a label. The reminder bubble and the progress ring are items on the
+# same canvas; while the bubble shows, the window grows around the pet and the pet's
+# items shift by (originX, originY) so it stays put on screen.
+class CanvasRenderer:
+    hasOverlays = True
+
+    def __init__(self, window):
+        self.window = window
+        self.canvas = tk.Canvas(window, bd = 0, highlightthickness = 0, bg = 'black', width = 1, height = 1)
+        self.canvas.pack()
+        self.widget = self.canvas
+        self.frameItems = {}      # PhotoImage -> image item
+        self.currentItem = None
+        self.bubbleItem = None
+        self.bubbleVisible = False
+        self.ringItems = None
+        self.ringExtent = None
+        self.originX = 0
+        self.originY = 0
+        self.size = None
+        self.petSize = (1, 1)
+        self.position = None
+        self.lastGeometry = None
+        self.tkCalls = 0
+        self.skippedCalls = 0
+
+    def render(self, frame, x, y, width, height, updatePosition=True):
+        moved = updatePosition and self.moveTo(x, y, width, height)
+        self.showFrame(frame)
+        return moved
+
+    def registerFrames(self, frames):
+        for frame in frames:
+            if frame not in self.frameItems:
+                self.addFrame(frame)
+
+    def addFrame(self, frame):
+        item = self.canvas.create_image(self.originX, self.originY, image = frame, anchor = "nw",
+                                        state = "hidden", tags = ("pet",))
+        self.frameItems[frame] = item
+        self.tkCalls += 1
+        # overlays stay above the pet
+        if self.bubbleItem is not None or self.ringItems is not None:
+            self.canvas.tag_raise("overlay")
+            self.tkCalls += 1
+        return item
+
+    def showFrame(self, frame):
+        item = self.frameItems.get(frame)
+        if item is None:
+            item = self.addFrame(frame)
+        if item == self.currentItem:
+            self.skippedCalls += 1
+            return False
+        if self.currentItem is not None:
+            self.canvas.itemconfigure(self.currentItem, state = "hidden")
+            self.tkCalls += 1
+        self.canvas.itemconfigure(item, state = "normal")
+        self.currentItem = item
+        self.tkCalls += 1
+        return True
+
+    # x, y is where the pet goes on screen; the window sits originX, originY above-left
+    def moveTo(self, x, y, width, height):
+        self.position = (x, y)
+        if (width, height) != self.petSize or self.size is None:
+            self.petSize = (width, height)
+            self.layout()
+        canvasWidth, canvasHeight = self.size
+        geometry = (canvasWidth, canvasHeight, x - self.originX, y - self.originY)
+        if geometry == self.lastGeometry:
+            self.skippedCalls += 1
+            return False
+        self.window.geometry(f'{canvasWidth}x{canvasHeight}+{x - self.originX}+{y - self.originY}')
+        self.lastGeometry = geometry
+        self.tkCalls += 1
+        return True
+
+    # sizes the canvas for the pet plus whatever overlays are showing
+    def layout(self):
+        width, height = self.petSize
+        originX = originY = 0
+        canvasWidth, canvasHeight = width, height
+        if self.bubbleVisible:
+            originX = max(0, BUBBLE_WIDTH // 2 - width // 2)
+            originY = BUBBLE_HEIGHT - BUBBLE_OVERLAP
+            canvasWidth = max(originX + width, originX + width // 2 + BUBBLE_WIDTH // 2)
+            canvasHeight = originY + height
+
+        if (originX, originY) != (self.originX, self.originY):
+            # the frames and the ring all carry the "pet" tag
+            self.canvas.move("pet", originX - self.originX, originY - self.originY)
+            self.tkCalls += 1
+            self.originX, self.originY = originX, originY
+        if self.bubbleVisible:
+            self.canvas.coords(self.bubbleItem, originX + width // 2, originY + BUBBLE_OVERLAP - BUBBLE_HEIGHT // 2)
+            self.tkCalls += 1
+        if (canvasWidth, canvasHeight) != self.size:
+            self.canvas.configure(width = canvasWidth, height = canvasHeight)
+            self.size = (canvasWidth, canvasHeight)
+            self.tkCalls += 1
+
+    # moves the window so the pet stays where it was on screen
+    def relayout(self):
+        self.layout()
+        if self.position is not None:
+            self.moveTo(self.position[0], self.position[1], *self.petSize)
+
+    def showBubble(self, image):
+        if self.bubbleItem is None:
+            self.bubbleItem = self.canvas.create_image(0, 0, image = image, anchor = "center",
+                                                       tags = ("overlay", "bubble"))
+        else:
+            self.canvas.itemconfigure(self.bubbleItem, image = image, state = "normal")
+            self.canvas.tag_raise(self.bubbleItem)
+        self.tkCalls += 1
+        self.bubbleVisible = True
+        self.relayout()
+
+    def hideBubble(self):
+        if not self.bubbleVisible:
+            return
+        self.canvas.itemconfigure(self.bubbleItem, state = "hidden")
+        self.tkCalls += 1
+        self.bubbleVisible = False
+        self.relayout()
+
+    # fraction of the daily goal as an arc in the pet's top-right corner; redrawn
+    # only when it moves by a whole degree
+    def setProgress(self, fraction):
+        extent = int(max(0.0, min(1.0, fraction)) * 360)
+        if extent == self.ringExtent:
+            self.skippedCalls += 1
+            return
+        if self.ringItems is None:
+            right = self.originX + self.petSize[0] - RING_MARGIN
+            top = self.originY + RING_MARGIN
+            box = (right - RING_SIZE, top, right, top + RING_SIZE)
+            track = self.canvas.create_oval(*box, outline = RING_TRACK_COLOUR, width = RING_WIDTH,
+                                            tags = ("overlay", "pet"))
+            arc = self.canvas.create_arc(*box, start = 90, extent = 0, style = "arc", outline = RING_COLOUR,
+                                         width = RING_WIDTH, tags = ("overlay", "pet"))
+            self.ringItems = (track, arc)
+            self.tkCalls += 2
+        # a full 360 degree extent draws nothing in Tk
+        self.canvas.itemconfigure(self.ringItems[1], extent = -min(extent, 359.9))
+        self.ringExtent = extent
+        self.tkCalls += 1
+
+    def getStats(self):
+        return {"tkCalls": self.tkCalls, "skippedCalls": self.skippedCalls, "frameItems": len(self.frameItems)}
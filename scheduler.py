@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import math
+import sys
+import time
+from collections import deque
+
+COALESCE_WINDOW_MS = 8
+WAKEUP_WINDOW_MS = 60000
+
+def monotonicMs():
+    return time.monotonic() * 1000
+
+class TimerHandle:
+    def __init__(self, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self.fired = False
+
+    def isPending(self):
+        return not (self.cancelled or self.fired)
+
+# Runs every timer in the app off a single deadline heap. Only the earliest deadline
+# holds a Tk after() slot, and timers due within the coalesce window share one wakeup.
+class Scheduler:
+    def __init__(self, window, coalesceMs=COALESCE_WINDOW_MS, clock=None):
+        self.window = window
+        self.clock = clock or monotonicMs
+        self.coalesceMs = coalesceMs
+        self.heap = []
+        self.counter = itertools.count()
+        self.armedId = None
+        self.armedDeadline = None
+        self.wakeups = 0
+        self.recentWakeups = deque()
+        self.callbacksRun = 0
+
+    def now(self):
+        return self.clock()
+
+    def schedule(self, delayMs, callback):
+        handle = TimerHandle(self.now() + delayMs, callback)
+        heapq.heappush(self.heap, (handle.deadline, next(self.counter), handle))
+        self.arm()
+        return handle
+
+    def cancel(self, handle):
+        if handle is None or not handle.isPending():
+            return
+        handle.cancelled = True
+        self.arm()
+
+    def arm(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+
+        if not self.heap:
+            if self.armedId is not None:
+                self.window.after_cancel(self.armedId)
+                self.armedId = None
+            return
+
+        deadline = self.heap[0][0]
+        if self.armedId is not None:
+            if self.armedDeadline <= deadline:
+                return
+            self.window.after_cancel(self.armedId)
+
+        # round up: a timer firing a fraction early finds nothing due and re-arms at 0 ms
+        delay = max(0, math.ceil(deadline - self.now()))
+        self.armedId = self.window.after(delay, self.wake)
+        self.armedDeadline = deadline
+
+    def wake(self):
+        self.armedId = None
+        self.wakeups += 1
+        now = self.now()
+        self.recentWakeups.append(now)
+        self.trimWakeups(now)
+
+        due = []
+        limit = now + self.coalesceMs
+        while self.heap and self.heap[0][0] <= limit:
+            handle = heapq.heappop(self.heap)[2]
+            if not handle.cancelled:
+                due.append(handle)
+
+        # one failing callback must not take the timers sharing its wakeup with it
+        try:
+            for handle in due:
+                if handle.cancelled:
+                    continue
+                handle.fired = True
+                self.callbacksRun += 1
+                try:
+                    handle.callback()
+                except Exception:
+                    self.window.report_callback_exception(*sys.exc_info())
+        finally:
+            self.arm()
+
+    def trimWakeups(self, now):
+        while self.recentWakeups and self.recentWakeups[0] <= now - WAKEUP_WINDOW_MS:
+            self.recentWakeups.popleft()
+
+    # interpreter wakeups over the last minute
+    def wakeupsPerMinute(self):
+        self.trimWakeups(self.now())
+        return len(self.recentWakeups)
+
+    def getStats(self):
+        return {"wakeups": self.wakeups, "callbacksRun": self.callbacksRun,
+                "wakeupsPerMinute": self.wakeupsPerMinute(),
+                "pending": sum(1 for entry in self.heap if entry[2].isPending())}
@@ -0,0 +1,268 @@
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+from clock import SimulatedClock
+from configManager import ConfigManager
+from intakeHistory import IntakeHistory, dayKey
+from reminders import IntervalRule, QuietHoursRule, ReminderEngine, clockMinute
+from scheduler import Scheduler
+
+DEFAULT_YEARS = 3
+CHECK_DELAY = 2          # s after midnight; the pet checks its files every 2 s
+REMINDER_SLACK = 1.0     # s of tolerance in the reminder checks
+DEFAULT_RULES = [
+    {"type": "interval", "minutes": 60},
+    {"type": "quietHours", "start": "22:00", "end": "08:00"},
+]
+
+# Sip patterns: times of day, ml per sip, optional weekend times, chance of skipping
+# a whole day and random jitter in minutes.
+PATTERNS = {
+    "steady": {"sips": ["08:30", "10:00", "11:30", "13:00", "14:30", "16:00", "17:30", "19:00"]},
+    "weekdays": {"sips": ["08:30", "10:00", "11:30", "13:00", "14:30", "16:00", "17:30", "19:00"],
+                 "weekendSips": ["11:00", "15:00", "19:00"]},
+    "lapses": {"sips": ["09:00", "10:30", "12:00", "13:30", "15:00", "16:30", "18:00", "19:30"],
+               "skipChance": 0.1, "jitterMinutes": 40},
+    "nightOwl": {"sips": ["00:30", "12:00", "14:00", "16:00", "18:00", "20:00", "22:00", "23:30"],
+                 "jitterMinutes": 20},
+}
+
+# Stands in for the Tk window under a Scheduler: after() timers fire in deadline
+# order as the simulated clock is moved forward.
+class SimulatedLoop:
+    def __init__(self, clock):
+        self.clock = clock
+        self.timers = []
+        self.cancelled = set()
+        self.counter = itertools.count(1)
+
+    def after(self, ms, callback):
+        timerId = next(self.counter)
+        heapq.heappush(self.timers, (self.clock.monotonicMs() + ms, timerId, callback))
+        return timerId
+
+    def after_cancel(self, timerId):
+        self.cancelled.add(timerId)
+
+    # a failing callback is a failed run, not something to print and carry on from
+    def report_callback_exception(self, exc, val, tb):
+        raise val
+
+    def runUntil(self, timestamp):
+        limit = timestamp * 1000
+        while self.timers and self.timers[0][0] <= limit:
+            deadline, timerId, callback = heapq.heappop(self.timers)
+            if timerId in self.cancelled:
+                self.cancelled.discard(timerId)
+                continue
+            self.clock.advanceTo(deadline / 1000)
+            callback()
+        self.clock.advanceTo(timestamp)
+
+# The history's records and index stay in memory. Nothing else reads them here, and
+# the locked append and index write per sip would otherwise be most of the run.
+class MemoryHistory(IntakeHistory):
+    def __init__(self):
+        IntakeHistory.__init__(self)
+        self.fileLock = contextlib.nullcontext()
+
+    def writeLines(self, data):
+        self.logSize += len(data)
+
+    def logSizeOnDisk(self):
+        return self.logSize
+
+    def saveIndex(self):
+        pass
+
+# Saves are gathered and written once per simulated day rather than on every sip.
+class SimulatedConfig(ConfigManager):
+    dirty = False
+
+    def save(self):
+        self.dirty = True
+
+    def flushSaves(self):
+        if self.dirty:
+            self.dirty = False
+            ConfigManager.save(self)
+
+def midnight(day):
+    return datetime(day.year, day.month, day.day).timestamp()
+
+# Drives a ConfigManager and ReminderEngine through scripted days on a simulated clock
+# and checks day rollover, streaks and reminder timing against its own bookkeeping.
+class Simulation:
+    def __init__(self, pattern, startDate, days, rules, seed):
+        self.pattern = pattern
+        self.startDate = startDate
+        self.days = days
+        self.random = random.Random(seed)
+        self.clock = SimulatedClock(midnight(startDate))
+        self.loop = SimulatedLoop(self.clock)
+        self.scheduler = Scheduler(self.loop, coalesceMs=0, clock=self.clock.monotonicMs)
+        self.config = SimulatedConfig(clock=self.clock, history=MemoryHistory())
+        self.reminders = ReminderEngine(self.scheduler, self.config, self.onReminder, rules, self.clock.time)
+
+        # checked against the rules the engine kept, as unreadable ones are skipped
+        self.interval = min((rule.interval for rule in self.reminders.rules if isinstance(rule, IntervalRule)),
+                            default=None)
+        self.quietRules = [rule for rule in self.reminders.rules if isinstance(rule, QuietHoursRule)]
+        self.totals = {}
+        self.expectedStreak = 0
+        self.lastSip = 0
+        self.lastReminder = 0
+        self.sips = 0
+        self.reminderCount = 0
+        self.checks = 0
+        self.failures = []
+
+    def fail(self, message):
+        if len(self.failures) < 20:
+            self.failures.append(f"{datetime.fromtimestamp(self.clock.time()):%Y-%m-%d %H:%M}: {message}")
+        else:
+            self.failures.append(None)
+
+    def check(self, condition, message):
+        self.checks += 1
+        if not condition:
+            self.fail(message)
+
+    def isQuiet(self, timestamp):
+        return any(rule.defer(timestamp) != timestamp for rule in self.quietRules)
+
+    def sipsFor(self, day):
+        times = self.pattern["sips"]
+        if day.weekday() >= 5 and "weekendSips" in self.pattern:
+            times = self.pattern["weekendSips"]
+        if self.random.random() < self.pattern.get("skipChance", 0):
+            return []
+        jitter = self.pattern.get("jitterMinutes", 0)
+        dayStart = midnight(day)
+        sips = []
+        for text in times:
+            minute = clockMinute(text) + (self.random.uniform(-jitter, jitter) if jitter else 0)
+            sips.append(dayStart + min(max(minute, 1), 1439) * 60)
+        return sorted(sips)
+
+    def onReminder(self):
+        now = self.clock.time()
+        self.reminderCount += 1
+        self.check(not self.isQuiet(now), "reminder during quiet hours")
+        if self.interval is not None:
+            self.check(now - max(self.lastSip, self.lastReminder) >= self.interval - REMINDER_SLACK,
+                       "reminder before the interval was up")
+        self.lastReminder = now
+
+    # the reminder that should have come by now, pushed past quiet hours
+    def checkNoMissedReminder(self):
+        if self.interval is None:
+            return
+        due = max(self.lastSip, self.lastReminder) + self.interval
+        for _ in range(len(self.quietRules) + 1):
+            for rule in self.quietRules:
+                due = rule.defer(due)
+        self.check(due > self.clock.time() - REMINDER_SLACK, "a due reminder never fired")
+
+    def rollOver(self, day):
+        yesterday = dayKey(day - timedelta(days=1))
+        goal = self.config.dailyGoal
+        if day != self.startDate:
+            self.expectedStreak = self.expectedStreak + 1 if self.totals.get(yesterday, 0) >= goal else 0
+
+        self.loop.runUntil(midnight(day) + CHECK_DELAY)
+        self.config.flushSaves()
+        if self.config.refresh():
+            self.reminders.reschedule()
+        self.check(self.config.today == day, f"still on {self.config.today} after midnight")
+        self.check(self.config.currentIntake == self.totals.get(dayKey(day), 0),
+                   f"intake {self.config.currentIntake} ml carried into a new day")
+        self.check(self.config.streak == self.expectedStreak,
+                   f"streak {self.config.streak}, expected {self.expectedStreak}")
+
+    def run(self):
+        self.reminders.start()
+        self.lastReminder = self.clock.time()
+        for offset in range(self.days):
+            day = self.startDate + timedelta(days=offset)
+            self.rollOver(day)
+            amount = self.pattern.get("amount", self.config.sipAmount)
+            for timestamp in self.sipsFor(day):
+                self.loop.runUntil(timestamp)
+                self.checkNoMissedReminder()
+                self.config.addIntake(amount)
+                self.lastSip = timestamp
+                self.sips += 1
+                key = dayKey(timestamp)
+                self.totals[key] = self.totals.get(key, 0) + amount
+                self.check(self.config.currentIntake == self.totals[key],
+                           f"intake {self.config.currentIntake} ml, expected {self.totals[key]}")
+        self.loop.runUntil(midnight(self.startDate + timedelta(days=self.days)))
+        self.reminders.stop()
+        self.config.flushSaves()
+        self.config.close()
+
+def loadPattern(name):
+    if name in PATTERNS:
+        return PATTERNS[name]
+    with open(name, "r") as fp:
+        return json.load(fp)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-forward the pet's day rollover, streak and reminder logic")
+    parser.add_argument("--pattern", default="steady",
+                        help=f"one of {', '.join(PATTERNS)} or a JSON file with the same keys")
+    parser.add_argument("--years", type=float, default=DEFAULT_YEARS)
+    parser.add_argument("--start", default="2024-01-01", help="first simulated day, YYYY-MM-DD")
+    parser.add_argument("--rules", help="JSON file with reminder rules (default: hourly, quiet 22:00-08:00)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pattern = loadPattern(args.pattern)
+    rules = DEFAULT_RULES
+    if args.rules:
+        with open(args.rules, "r") as fp:
+            rules = json.load(fp)
+    days = max(1, round(args.years * 365))
+
+    # run in a scratch directory so the real config and history stay untouched
+    workDir = tempfile.mkdtemp(prefix="dew-sim-")
+    oldDir = os.getcwd()
+    os.chdir(workDir)
+    try:
+        simulation = Simulation(pattern, date.fromisoformat(args.start), days, rules, args.seed)
+        start = time.perf_counter()
+        simulation.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(oldDir)
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    failures = [failure for failure in simulation.failures if failure is not None]
+    print(f"simulated {days} days: {simulation.sips} sips, {simulation.reminderCount} reminders, "
+          f"final streak {simulation.config.streak}")
+    print(f"{elapsed:.2f} s wall, {days / elapsed:,.0f} days/s, {simulation.sips / elapsed:,.0f} sips/s, "
+          f"{simulation.checks} checks")
+    if simulation.failures:
+        print(f"{len(simulation.failures)} failed checks:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("all checks passed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
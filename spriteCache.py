@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import tkinter as tk
+
+PATH_SPRITE_CACHE = os.path.join(".cache", "sprites")
+INDEX_FILE = "index.json"
+
+# file contents an I/O worker read ahead, by path; images opened from here skip the disk
+prefetched = {}
+
+# Keeps decoded, pre-scaled animation frames on disk as PNGs so a warm start
+# skips GIF decoding and zooming. Entries are keyed by source path, mtime and scale.
+class SpriteCache:
+    def __init__(self, cacheDir=PATH_SPRITE_CACHE):
+        self.cacheDir = cacheDir
+        self.indexPath = os.path.join(cacheDir, INDEX_FILE)
+        self.index = self.loadIndex()
+
+    def loadIndex(self):
+        try:
+            with open(self.indexPath, "r") as fp:
+                index = json.load(fp)
+            if isinstance(index, dict):
+                return index
+        except (json.JSONDecodeError, OSError):
+            pass
+        return {}
+
+    def saveIndex(self):
+        tmpPath = self.indexPath + ".tmp"
+        try:
+            os.makedirs(self.cacheDir, exist_ok=True)
+            with open(tmpPath, "w") as fp:
+                json.dump(self.index, fp)
+            os.replace(tmpPath, self.indexPath)
+        except OSError:
+            pass
+
+    def makeKey(self, path, scale):
+        mtime = os.stat(path).st_mtime_ns
+        source = f"{os.path.abspath(path)}|{mtime}|{scale}"
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def getFrames(self, path, numFrames, scale):
+        key = self.makeKey(path, scale)
+        entry = self.index.get(path)
+
+        if entry is not None and entry.get("key") == key:
+            frames = self.readFrames(key, entry.get("frames", 0))
+            if frames:
+                return frames
+
+        frames = decodeFrames(path, numFrames, scale)
+        self.writeFrames(path, key, frames)
+        return frames
+
+    # the cached PNGs getFrames would read, or [] when it would decode the source
+    def framePaths(self, path, scale):
+        try:
+            key = self.makeKey(path, scale)
+        except OSError:
+            return []
+        entry = self.index.get(path)
+        if entry is None or entry.get("key") != key:
+            return []
+        frameDir = os.path.join(self.cacheDir, key)
+        return [os.path.join(frameDir, f"{i}.png") for i in range(entry.get("frames", 0))]
+
+    def readFrames(self, key, numFrames):
+        frameDir = os.path.join(self.cacheDir, key)
+        try:
+            return [openImage(os.path.join(frameDir, f"{i}.png"), "png")
+                    for i in range(numFrames)]
+        except tk.TclError:
+            return []
+
+    def writeFrames(self, path, key, frames):
+        # drop the stale entry for this asset before writing the new one
+        oldEntry = self.index.get(path)
+        if oldEntry is not None and oldEntry.get("key") != key:
+            shutil.rmtree(os.path.join(self.cacheDir, oldEntry["key"]), ignore_errors=True)
+
+        frameDir = os.path.join(self.cacheDir, key)
+        try:
+            os.makedirs(frameDir, exist_ok=True)
+            for i, frame in enumerate(frames):
+                frame.write(os.path.join(frameDir, f"{i}.png"), format="png")
+        except (OSError, tk.TclError):
+            shutil.rmtree(frameDir, ignore_errors=True)
+            return
+
+        self.index[path] = {"key": key, "frames": len(frames)}
+        self.saveIndex()
+
+# Tk only decodes on its own thread, so workers hand over bytes, not images.
+def openImage(path, format=None):
+    options = {"format": format} if format else {}
+    data = prefetched.get(path)
+    if data is not None:
+        try:
+            return tk.PhotoImage(data=data, **options)
+        except tk.TclError:
+            pass
+    return tk.PhotoImage(file=path, **options)
+
+# runs on an I/O worker; unreadable files are left for the decode to report
+def readFiles(paths):
+    data = {}
+    for path in paths:
+        try:
+            with open(path, "rb") as fp:
+                data[path] = fp.read()
+        except OSError:
+            pass
+    return data
+
+# Decodes a GIF frame by frame and scales it: scales above 1 zoom, fractional scales
+# subsample. When numFrames is None every frame is read.
+def decodeFrames(path, numFrames, scale):
+    frames = []
+    frameIndex = 0
+    while numFrames is None or frameIndex < numFrames:
+        try:
+            frames.append(decodeFrame(path, frameIndex, scale))
+        except tk.TclError:
+            if numFrames is None and frames:
+                break
+            raise
+        frameIndex += 1
+    return frames
+
+def decodeFrame(path, frameIndex, scale):
+    frame = openImage(path, 'gif -index %i' % frameIndex)
+    if scale > 1:
+        frame = frame.zoom(int(scale), int(scale))
+    elif scale < 1:
+        factor = round(1 / scale)
+        frame = frame.subsample(factor, factor)
+    return frame
+
+# Cuts a horizontal strip sprite sheet into its frames, or just the ones in indexes.
+def sliceSheet(path, numFrames, frameWidth, frameHeight, indexes=None):
+    sheet = openImage(path, "png")
+    frames = []
+    for i in (range(numFrames) if indexes is None else indexes):
+        frame = tk.PhotoImage(width=frameWidth, height=frameHeight)
+        frame.tk.call(frame, "copy", sheet, "-from", i * frameWidth, 0,
+                      (i + 1) * frameWidth, frameHeight, "-to", 0, 0)
+        frames.append(frame)
+    return frames
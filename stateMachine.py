@@ -0,0 +1,105 @@
+import json
+
+PATH_ANIMATIONS = "assets/animations.json"
+
+loadedSpecs = {}
+
+# Declarative pet states: each state names a sprite, optional intro frames played
+# once, loop frames played forever and a delay (one value, one per frame, or
+# "source" for the durations stored in the GIF). Transitions map an event to the
+# next state per current state, with "*" as the fallback.
+def loadStateMachine(path=PATH_ANIMATIONS):
+    if path not in loadedSpecs:
+        with open(path, "r") as fp:
+            loadedSpecs[path] = json.load(fp)
+    return loadedSpecs[path]
+
+def resolveDelays(name, state, sequence, durationsFor):
+    delay = state.get("delay", 100)
+    if delay == "source":
+        durations = durationsFor(state["sprite"])
+        return [durations[frameIndex] for frameIndex in sequence]
+    if isinstance(delay, list):
+        if len(delay) != len(sequence):
+            raise ValueError(f"state '{name}' has {len(delay)} delays for {len(sequence)} frames")
+        return list(delay)
+    return [delay] * len(sequence)
+
+# Every state flattened into shared frame, delay and next-position arrays. A state
+# is just its start position; advancing is a single lookup in each array. Delays and
+# links are tuples so one compiled set can be shared by any number of pets; frames are
+# filled in one sprite at a time, on first use or by loadNext, and never change after.
+class CompiledAnimations:
+    def __init__(self, spec, frameCount, framesFor, durationsFor):
+        self.framesFor = framesFor
+        self.frames = []
+        self.sprites = []          # sprite behind each position
+        self.sourceIndexes = []    # frame of that sprite
+        self.delays = []
+        self.next = []
+        self.starts = {}
+        self.loadedSprites = set()
+
+        for name, state in spec["states"].items():
+            sprite = state["sprite"]
+            count = frameCount(sprite)
+            intro = state.get("intro", [])
+            sequence = intro + state["loop"]
+            for frameIndex in sequence:
+                if frameIndex >= count:
+                    raise ValueError(f"state '{name}' uses frame {frameIndex} of '{sprite}', "
+                                     f"which has {count} frames")
+
+            start = len(self.frames)
+            loopStart = start + len(intro)
+            self.starts[name] = start
+            self.frames.extend([None] * len(sequence))
+            self.sprites.extend([sprite] * len(sequence))
+            self.sourceIndexes.extend(sequence)
+            self.delays.extend(resolveDelays(name, state, sequence, durationsFor))
+            self.next.extend(range(start + 1, start + len(sequence)))
+            self.next.append(loopStart)
+
+        self.delays = tuple(self.delays)
+        self.next = tuple(self.next)
+        self.initial = self.starts[spec["initial"]]
+        # the initial state's sprite first, then the rest in spec order
+        self.spriteOrder = list(dict.fromkeys([self.sprites[self.initial]] + self.sprites))
+
+    def frameAt(self, position):
+        frame = self.frames[position]
+        if frame is None:
+            self.loadSprite(self.sprites[position])
+            frame = self.frames[position]
+        return frame
+
+    # stands in for one position until its sprite is loaded
+    def setFrame(self, position, frame):
+        if self.frames[position] is None:
+            self.frames[position] = frame
+
+    def loadSprite(self, sprite):
+        spriteFrames = self.framesFor(sprite)
+        for position, name in enumerate(self.sprites):
+            if name == sprite:
+                self.frames[position] = spriteFrames[self.sourceIndexes[position]]
+        self.loadedSprites.add(sprite)
+
+    # the sprite loadNext would load; None once everything is loaded
+    def nextSprite(self):
+        for sprite in self.spriteOrder:
+            if sprite not in self.loadedSprites:
+                return sprite
+        return None
+
+    # loads one more sprite; False once everything is loaded
+    def loadNext(self):
+        sprite = self.nextSprite()
+        if sprite is None:
+            return False
+        self.loadSprite(sprite)
+        return True
+
+    def loadAll(self):
+        while self.loadNext():
+            pass
@@ -0,0 +1,171 @@
+import json
+import math
+import threading
+import urllib.error
+import urllib.request
+from intakeHistory import dayKey
+from persistence import WriteBehindWriter
+
+PATH_SYNC_STATE = "sync_state.json"
+SYNC_BATCH = 500          # sips per request
+SYNC_DELAY = 2.0          # seconds to gather a burst of sips into one request
+RETRY_MIN = 1.0
+RETRY_MAX = 300.0         # back off to five minutes while the server is unreachable
+REQUEST_TIMEOUT = 5.0
+MAX_SIP_ML = 5000         # the server's limit; bigger sips are kept out of requests
+
+# [timestamp, amount, day] for each record the server's checks would let through
+def sendableEvents(records):
+    events = []
+    for timestamp, amount in records:
+        if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or not math.isfinite(timestamp):
+            continue
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not 0 < amount <= MAX_SIP_ML:
+            continue
+        try:
+            day = dayKey(timestamp)
+        except (OverflowError, OSError, ValueError):
+            continue
+        events.append([timestamp, amount, day])
+    return events
+
+def readError(error):
+    try:
+        return json.loads(error.read()).get("error", error.reason)
+    except (OSError, ValueError, AttributeError):
+        return error.reason
+
+# Ships the intake log to a classroom sync server from a background thread. The log
+# offset up to which the server has confirmed every sip is kept on disk, so the rest
+# of the log is the queue: sips logged while offline or before a restart go out with
+# the next successful send. The server ignores sips it already has, so sending a
+# batch again after a lost reply is harmless. Records the server could never take,
+# e.g. from a hand-edited log, are left out of the requests rather than resent.
+class SyncClient:
+    def __init__(self, url, student, history, goal, statePath=PATH_SYNC_STATE):
+        self.url = url.rstrip("/")
+        self.student = student
+        self.history = history
+        self.goal = goal          # callable returning the current daily goal
+        self.statePath = statePath
+        self.offset = self.loadState()
+        self.stateWriter = WriteBehindWriter(statePath)
+        self.condition = threading.Condition()
+        self.wanted = False
+        self.closed = False
+        self.thread = None
+        self.retryDelay = 0
+        self.sent = 0
+        self.skipped = 0
+        self.failures = 0
+        self.lastError = None
+
+    # a different server or student name starts over; the server drops duplicates
+    def loadState(self):
+        try:
+            with open(self.statePath, "r") as fp:
+                state = json.load(fp)
+            if state.get("url") == self.url and state.get("student") == self.student:
+                return int(state.get("offset", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+        return 0
+
+    def saveState(self):
+        self.stateWriter.submit({"url": self.url, "student": self.student, "offset": self.offset})
+
+    def start(self):
+        self.history.subscribe(self.onSips)
+        self.thread = threading.Thread(target=self.run, name="sync", daemon=True)
+        self.thread.start()
+        # anything left over from last time
+        self.wake()
+
+    def onSips(self, records):
+        self.wake()
+
+    def wake(self):
+        with self.condition:
+            self.wanted = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.wanted and not self.closed:
+                    self.condition.wait()
+                if not self.closed:
+                    self.condition.wait(SYNC_DELAY)
+                if self.closed:
+                    return
+                self.wanted = False
+            if not self.sendPending():
+                with self.condition:
+                    self.wanted = True
+                    if not self.closed:
+                        self.condition.wait(self.retryDelay)
+
+    # sends everything after the confirmed offset; False when the server is unreachable
+    def sendPending(self):
+        if self.offset > self.history.logSizeOnDisk():
+            # the log was replaced
+            self.offset = 0
+        while not self.closed:
+            records, offset = self.history.readFrom(self.offset, SYNC_BATCH)
+            if offset == self.offset:
+                return True
+            events = sendableEvents(records)
+            stored = self.post(events) if events else 0
+            if stored is None:
+                # the offset stays put, so nothing the server has not stored is lost
+                self.failures += 1
+                self.retryDelay = min(max(RETRY_MIN, self.retryDelay * 2), RETRY_MAX)
+                return False
+            self.retryDelay = 0
+            self.sent += stored
+            self.skipped += len(records) - len(events)
+            self.offset = offset
+            self.saveState()
+        return True
+
+    # how many of the events the server has stored, old or new; None unless all of them
+    def post(self, events):
+        body = json.dumps({"student": self.student, "goal": self.goal(), "events": events})
+        request = urllib.request.Request(self.url + "/events", data=body.encode("utf-8"), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                reply = json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            # a refused request, e.g. a student name the server does not take, is retried
+            # with backoff too; skipping it would drop the sips for good
+            self.lastError = f"HTTP {e.code}: {readError(e)}"
+            return None
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            self.lastError = str(e)
+            return None
+        if not isinstance(reply, dict):
+            reply = {}
+        if reply.get("rejected"):
+            # stricter limits than ours; the stored ones are duplicates next time
+            errors = reply.get("errors") or [{}]
+            self.lastError = f"server rejected {reply['rejected']} sips: {errors[0].get('error', '?')}"
+            return None
+        self.lastError = None
+        # servers before partial acceptance only ever answered 200 for a whole batch
+        return reply.get("accepted", len(events)) + reply.get("duplicates", 0)
+
+    def getStats(self):
+        return {"sent": self.sent, "skipped": self.skipped, "failures": self.failures, "offset": self.offset,
+                "retryDelay": self.retryDelay, "lastError": self.lastError}
+
+    # does not wait for the network; whatever is unsent goes out next time
+    def close(self):
+        self.history.unsubscribe(self.onSips)
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(REQUEST_TIMEOUT + 1)
+            self.thread = None
+        self.stateWriter.close()
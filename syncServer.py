@@ -0,0 +1,294 @@
+import argparse
+import json
+import math
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PATH_DATABASE = "classroom.db"
+POOL_SIZE = 4
+BATCH_WINDOW = 0.01       # seconds the writer waits for more requests to share a transaction
+MAX_BATCH_EVENTS = 5000
+MAX_REQUEST_EVENTS = 1000
+MAX_SIP_ML = 5000
+MAX_GOAL_ML = 100000
+MAX_REPORTED_REJECTS = 10
+COMMIT_TIMEOUT = 10.0
+LISTEN_BACKLOG = 512
+
+# Classroom aggregation service for Dew. Pets POST their sips to /events; a teacher
+# asks GET /progress?day=YYYY-MM-DD (today by default) for class-wide totals.
+#   python syncServer.py [--port 8765] [--db classroom.db]
+# Requests never write themselves: they hand their events to one writer thread,
+# which commits whatever has queued up in a single transaction and updates the
+# per-student and per-class daily rollups in the same go. Queries read the rollups
+# through a small pool of connections, which WAL mode keeps clear of the writer.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    student TEXT NOT NULL, t REAL NOT NULL, ml INTEGER NOT NULL, day TEXT NOT NULL,
+    PRIMARY KEY (student, t)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL, student TEXT NOT NULL, total INTEGER NOT NULL, sips INTEGER NOT NULL,
+    goal INTEGER NOT NULL, PRIMARY KEY (day, student)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS class_daily (
+    day TEXT PRIMARY KEY, students INTEGER NOT NULL, total INTEGER NOT NULL, sips INTEGER NOT NULL,
+    goal_met INTEGER NOT NULL);
+"""
+
+class BadRequest(ValueError):
+    pass
+
+def connect(path):
+    connection = sqlite3.connect(path, check_same_thread=False, timeout=COMMIT_TIMEOUT)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(connect(path))
+
+    @contextmanager
+    def connection(self):
+        connection = self.connections.get()
+        try:
+            yield connection
+        finally:
+            self.connections.put(connection)
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get().close()
+
+class PendingWrite:
+    def __init__(self, student, goal, events):
+        self.student = student
+        self.goal = goal
+        self.events = events
+        self.done = threading.Event()
+        self.accepted = 0
+        self.error = None
+
+# The only thread that writes. Requests queued while a transaction runs share the
+# next one, so commits stay few however many clients post at once.
+class BatchWriter:
+    def __init__(self, path):
+        self.connection = connect(path)
+        self.connection.executescript(SCHEMA)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="sync-writer", daemon=True)
+        self.transactions = 0
+        self.eventsWritten = 0
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, write):
+        self.queue.put(write)
+        if not write.done.wait(COMMIT_TIMEOUT):
+            raise TimeoutError("the write queue is backed up")
+        if write.error is not None:
+            raise write.error
+        return write.accepted
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            if batch[0] is None:
+                return
+            count = len(batch[0].events)
+            deadline = time.monotonic() + BATCH_WINDOW
+            while count < MAX_BATCH_EVENTS:
+                try:
+                    write = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if write is None:
+                    self.queue.put(None)
+                    break
+                batch.append(write)
+                count += len(write.events)
+            self.commit(batch)
+
+    def commit(self, batch):
+        try:
+            with self.connection:
+                deltas = {}     # (day, student) -> [ml, sips, goal]
+                for write in batch:
+                    for timestamp, amount, day in write.events:
+                        cursor = self.connection.execute(
+                            "INSERT OR IGNORE INTO events (student, t, ml, day) VALUES (?, ?, ?, ?)",
+                            (write.student, timestamp, amount, day))
+                        if cursor.rowcount:
+                            write.accepted += 1
+                            delta = deltas.setdefault((day, write.student), [0, 0, write.goal])
+                            delta[0] += amount
+                            delta[1] += 1
+                            delta[2] = write.goal
+                self.connection.executemany(
+                    "INSERT INTO daily (day, student, total, sips, goal) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (day, student) DO UPDATE SET total = total + excluded.total, "
+                    "sips = sips + excluded.sips, goal = excluded.goal",
+                    [(day, student, ml, sips, goal) for (day, student), (ml, sips, goal) in deltas.items()])
+                # the class rollup for just the days this batch touched
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO class_daily (day, students, total, sips, goal_met) "
+                    "SELECT day, COUNT(*), SUM(total), SUM(sips), SUM(goal > 0 AND total >= goal) FROM daily "
+                    "WHERE day = ? GROUP BY day",
+                    [(day,) for day in {day for day, _ in deltas}])
+            self.transactions += 1
+            self.eventsWritten += sum(write.accepted for write in batch)
+        except sqlite3.Error as e:
+            for write in batch:
+                write.accepted = 0
+                write.error = e
+        for write in batch:
+            write.done.set()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.connection.close()
+
+class ClassroomServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, address, databasePath=PATH_DATABASE):
+        self.writer = BatchWriter(databasePath)
+        self.pool = ConnectionPool(databasePath)
+        ThreadingHTTPServer.__init__(self, address, RequestHandler)
+        self.writer.start()
+
+    def progress(self, day, detail=False):
+        with self.pool.connection() as connection:
+            row = connection.execute("SELECT students, total, sips, goal_met FROM class_daily WHERE day = ?",
+                                     (day,)).fetchone()
+            students, total, sips, goalMet = row or (0, 0, 0, 0)
+            result = {"day": day, "students": students, "totalMl": total, "sips": sips, "goalMet": goalMet,
+                      "averageMl": round(total / students) if students else 0}
+            if detail:
+                result["perStudent"] = [
+                    {"student": student, "totalMl": studentTotal, "sips": studentSips, "goal": goal}
+                    for student, studentTotal, studentSips, goal in connection.execute(
+                        "SELECT student, total, sips, goal FROM daily WHERE day = ? ORDER BY student", (day,))]
+        return result
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.writer.close()
+        self.pool.close()
+
+def parseEvents(body):
+    try:
+        data = json.loads(body)
+        student = data["student"]
+        # json takes Infinity, which int() cannot
+        goal = int(data.get("goal", 0))
+        events = data["events"]
+    except (ValueError, KeyError, TypeError, AttributeError, OverflowError):
+        raise BadRequest("expected {\"student\", \"goal\", \"events\"}")
+    if not 0 <= goal <= MAX_GOAL_ML:
+        raise BadRequest(f"goal must be 0 to {MAX_GOAL_ML} ml")
+    if not isinstance(student, str) or not 0 < len(student) <= 64:
+        raise BadRequest("bad student name")
+    if not isinstance(events, list) or len(events) > MAX_REQUEST_EVENTS:
+        raise BadRequest(f"events must be a list of at most {MAX_REQUEST_EVENTS}")
+    # one bad sip must not cost the good ones sent with it; they are kept and the
+    # bad ones reported back by index
+    parsed = []
+    rejected = []
+    for index, event in enumerate(events):
+        try:
+            parsed.append(parseEvent(event))
+        except BadRequest as e:
+            rejected.append((index, str(e)))
+    return student, goal, parsed, rejected
+
+def parseEvent(event):
+    try:
+        timestamp, amount, day = event
+        timestamp = float(timestamp)
+        date.fromisoformat(day)
+    except (ValueError, TypeError):
+        raise BadRequest(f"bad event {event!r}")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise BadRequest(f"bad amount in {event!r}")
+    if not math.isfinite(timestamp) or not 0 < amount <= MAX_SIP_ML:
+        raise BadRequest(f"event out of range: {event!r}")
+    return timestamp, int(amount), day
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if urlparse(self.path).path != "/events":
+            return self.reply(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            student, goal, events, rejected = parseEvents(self.rfile.read(length))
+        except (BadRequest, ValueError) as e:
+            return self.reply(400, {"error": str(e)})
+        accepted = 0
+        if events:
+            try:
+                accepted = self.server.writer.submit(PendingWrite(student, goal, events))
+            except (TimeoutError, sqlite3.Error) as e:
+                return self.reply(503, {"error": str(e)})
+        self.reply(200, {"accepted": accepted, "duplicates": len(events) - accepted,
+                         "rejected": len(rejected),
+                         "errors": [{"index": index, "error": error}
+                                    for index, error in rejected[:MAX_REPORTED_REJECTS]]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/progress":
+            return self.reply(404, {"error": "not found"})
+        query = parse_qs(url.query)
+        day = query.get("day", [date.today().isoformat()])[0]
+        try:
+            date.fromisoformat(day)
+        except ValueError:
+            return self.reply(400, {"error": "day must be YYYY-MM-DD"})
+        self.reply(200, self.server.progress(day, detail=query.get("detail", ["0"])[0] == "1"))
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # one line per request would swamp the console with a full lab logging
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect sips from a classroom of pets")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=PATH_DATABASE, help="SQLite database file")
+    args = parser.parse_args()
+
+    server = ClassroomServer((args.host, args.port), args.db)
+    print(f"listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())